@@ -0,0 +1,106 @@
+import argparse
+import json
+import sys
+
+from src.benchmark import (
+    SOLVERS,
+    benchmark_dataset,
+    datasets,
+    machine_fingerprint,
+    regressions,
+    summarize,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "datasets",
+        type=str,
+        nargs="*",
+        help="Puzzle files to benchmark, every one in data/ by default",
+    )
+    parser.add_argument(
+        "--solvers",
+        type=str,
+        nargs="+",
+        choices=list(SOLVERS),
+        default=list(SOLVERS),
+        help="Solvers to benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per puzzle")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs first")
+    parser.add_argument(
+        "--limit", type=int, default=10, help="Puzzles per dataset (0 for all)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Seconds before a solve is stopped and recorded as TIMEOUT",
+    )
+    parser.add_argument(
+        "--no-phases",
+        action="store_true",
+        help="Do not time the propagate/decide/analyze phases",
+    )
+    parser.add_argument(
+        "--output", type=str, default="benchmark.json", help="JSON file to write"
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        help="Earlier JSON output, exit with an error if any median solve time "
+        "grew by more than --threshold",
+    )
+    parser.add_argument("--threshold", type=float, default=1.1)
+    args = parser.parse_args()
+
+    records = []
+    for path in args.datasets or datasets():
+        print(f"Benchmarking {path}", file=sys.stderr)
+        records += benchmark_dataset(
+            path,
+            args.solvers,
+            repeat=args.repeat,
+            warmup=args.warmup,
+            limit=args.limit or None,
+            phases=not args.no_phases,
+            timeout=args.timeout,
+        )
+
+    summary = summarize(records)
+    report = {
+        "machine": machine_fingerprint(),
+        "config": vars(args),
+        "summary": summary,
+        "results": records,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for key, stats in summary.items():
+        if stats["median_ns"] is None:
+            print(f"{key}: {stats['timeouts']} of {stats['runs']} runs timed out")
+            continue
+        print(
+            f"{key}: median {stats['median_ns'] / 1e6:.2f} ms over {stats['runs']}"
+            f" ({stats['timeouts']} timed out)"
+        )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # the commit is expected to differ, the rest of the machine is not
+        machine = {**baseline["machine"], "commit": report["machine"]["commit"]}
+        if machine != report["machine"]:
+            print("Warning: baseline was measured on another machine", file=sys.stderr)
+        slower = regressions(summary, baseline["summary"], args.threshold)
+        for key, ratio in slower.items():
+            print(f"Regression: {key} is {ratio:.2f}x slower")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,9 @@
-import sys
-
 from src.cnf import CNFClauseSet
 from src.utils import print_sudoku
 from src.dpll_random import DPLLRandom
 from src.dpll_dlis import DPLLDLIS
 from src.dpll_jsw import DPLLDLJW
 
-sys.setrecursionlimit(5000)
-
 
 def main():
     n = 9  # sudoku size, choose between [4, 9, 16]
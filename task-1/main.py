@@ -1,8 +1,9 @@
 import argparse
 
-from src.cnf import CNFClauseSet
-from src.dpll_random import DPLLRandom
-from src.dpll_dlis import DPLLDLIS
+from src.budget import UNKNOWN, add_budget_arguments, budget_from_args
+from src.dimacs import read_dimacs
+from src.portfolio import SOLVERS, Portfolio
+from src.preprocess import Preprocessor
 
 
 def main():
@@ -11,40 +12,43 @@ def main():
     parser.add_argument(
         "method",
         type=str,
-        choices=["random", "dlis", "cdcl"],
+        choices=list(SOLVERS) + ["portfolio"],
         default="random",
         nargs="?",
         help="Method to use for DPLL",
     )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Simplify the formula before solving it",
+    )
+    add_budget_arguments(parser)
     args = parser.parse_args()
 
     # Choose algorithm
-    method = args.method
-    if method == "random":
-        dpll_cls = DPLLRandom
-    elif method == "dlis":
-        dpll_cls = DPLLDLIS
-    elif method == "cdcl":
-        raise NotImplementedError
+    if args.method == "portfolio":
+        dpll_cls = Portfolio
     else:
-        raise ValueError("Invalid method")
+        dpll_cls = SOLVERS[args.method]
 
-    # Read formula in DIMACS format
-    filename = args.filename
-    formula = []
-
-    with open(filename, "r") as f:
-        for line in f.readlines()[1:]:
-            formula.append(list(map(int, line.strip().split(" ")[:-1])))
+    # Read formula in DIMACS format, optionally .gz or .xz compressed
+    cnf = read_dimacs(args.filename)
+    if args.preprocess:
+        preprocessor = Preprocessor(cnf)
+        cnf = preprocessor.simplify()
 
     # Solve formula
-    cnf = CNFClauseSet(formula)
-    dpll = dpll_cls(cnf)
-    result = dpll.backtrack(cnf)
+    dpll = dpll_cls(cnf, budget=budget_from_args(args))
+    result = dpll.solve()
+    if result[0] and args.preprocess:
+        result = True, preprocessor.reconstruct(result[1])
 
     if result[0]:
         print("SAT")
         print(result[1])
+    elif result[0] is UNKNOWN:
+        print("UNKNOWN")
+        print({})
     else:
         print("UNSAT")
         print({})
@@ -1,16 +1,26 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
 import os
+
 import pandas as pd
 
-from src.cnf import CNFClauseSet
-from src.dpll_random import DPLLRandom
-from src.dpll_dlis import DPLLDLIS
-from src.dpll_jsw import DPLLDLJW
+from src.budget import UNKNOWN, Budget
+from src.cnf import CNFClauseSet, sudoku_rules
+from src.portfolio import SOLVERS
+from src.stats import COLUMNS as STATS_COLUMNS
 
 DATA_PATH = "./data"
 RESULTS_PATH = "./results"
 NUM_RUNS = 15
-ENABLE_MULTIPROCESSING = False
+# number of worker processes, 0 uses every logical core; one by default so
+# SMT siblings do not compete and inflate the measured times
+JOBS = 1
 WARMUP_ROUNDS = 3
+# seconds a single solve may take, None for no limit
+TIMEOUT = None
 
 test_sets = [
     "easy-4x4.txt",
@@ -20,90 +30,265 @@ test_sets = [
     # "harder-9x9.txt"
 ]
 
+solver_names = ["random", "dlis", "jsw"]
+
+COLUMNS = ["algorithm", "run_id", "sudoku_id", "exec_time", "branch_count", "status"]
+# every solver reports the same statistics
+COLUMNS += STATS_COLUMNS
+# status of a finished task
+STATUSES = ("SAT", "TIMEOUT")
+
+# puzzles, limits and profiling of the current process, set by init_worker
+sudokus = []
+timeout = None
+profile = False
+
 
 def main():
-    for filename in test_sets:
-        exp_data_df = run_experiment(filename)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "test_sets",
+        type=str,
+        nargs="*",
+        default=test_sets,
+        help=f"Puzzle files in {DATA_PATH}",
+    )
+    parser.add_argument(
+        "--solvers",
+        type=str,
+        nargs="+",
+        choices=list(SOLVERS),
+        default=solver_names,
+        help="Solvers to compare",
+    )
+    parser.add_argument("--runs", type=int, default=NUM_RUNS)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help="Number of worker processes, 0 uses every logical core",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=TIMEOUT,
+        help="Seconds a single solve may take",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the time spent in every phase of the search",
+    )
+    args = parser.parse_args()
+
+    for filename in args.test_sets:
         filename_noext = filename.split(".")[0]
+        checkpoint = os.path.join(RESULTS_PATH, f"{filename_noext}.partial.csv")
+        exp_data_df = run_experiment(
+            filename,
+            args.solvers,
+            checkpoint,
+            args.runs,
+            args.jobs,
+            args.timeout,
+            args.profile,
+        )
         exp_data_df.to_csv(
             os.path.join(RESULTS_PATH, f"{filename_noext}.csv"), index=False
         )
+        # the results are saved, a new experiment starts from scratch
+        remove_checkpoint(checkpoint)
 
 
-def run_experiment(filename):
-    solver_names = ["random", "dlis", "jsw"]
-    solvers = {"random": DPLLRandom, "dlis": DPLLDLIS, "jsw": DPLLDLJW}
-    sudokus = []
-    res_df = pd.DataFrame(
-        columns=["algorithm", "run_id", "sudoku_id", "exec_time", "branch_count"]
-    )
+def settings_file(checkpoint):
+    return os.path.splitext(checkpoint)[0] + ".json"
+
 
+def remove_checkpoint(checkpoint):
+    """
+    Deletes the checkpoint CSV of an experiment and its settings.
+    """
+    for path in (checkpoint, settings_file(checkpoint)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_experiment(
+    filename,
+    solvers=solver_names,
+    checkpoint=None,
+    num_runs=NUM_RUNS,
+    jobs=JOBS,
+    task_timeout=TIMEOUT,
+    task_profile=False,
+):
+    """
+    Solves every puzzle of the set num_runs times with every solver. Every
+    (solver, puzzle, run) is a separate task, so all the workers stay busy
+    until the last task. Finished tasks are appended to the checkpoint CSV
+    as they complete and skipped when the experiment is started again with
+    the same settings. The caller removes the checkpoint with
+    remove_checkpoint once the results are saved, so the next experiment
+    measures everything again.
+    """
     with open(os.path.join(DATA_PATH, filename), "r") as f:
-        for line in f.readlines():
-            sudokus.append(line.strip())
-
-    cnfs = [CNFClauseSet.from_sudoku(sudoku) for sudoku in sudokus]
-
-    if ENABLE_MULTIPROCESSING:
-        import multiprocessing
-
-        with multiprocessing.Pool(processes=len(solver_names)) as pool:
-            results = [
-                pool.apply_async(
-                    _run_exp,
-                    args=(solvers[solver_name], solver_name, cnfs, WARMUP_ROUNDS),
-                )
-                for solver_name in solver_names
-            ]
-
-            for result in results:
-                res_df = pd.concat([res_df, result.get()])
-    else:
-        for solver_name in solver_names:
-            res_df = pd.concat(
-                [
-                    res_df,
-                    _run_exp(solvers[solver_name], solver_name, cnfs, WARMUP_ROUNDS),
-                ]
-            )
+        puzzles = [line.strip() for line in f if line.strip()]
+    if checkpoint is None:
+        filename_noext = filename.split(".")[0]
+        checkpoint = os.path.join(RESULTS_PATH, f"{filename_noext}.partial.csv")
 
-    return res_df
+    settings = {
+        "solvers": list(solvers),
+        "num_runs": num_runs,
+        "timeout": task_timeout,
+        "profile": task_profile,
+    }
+    settings_path = settings_file(checkpoint)
+    check_settings(settings_path, settings, checkpoint)
 
+    done = load_checkpoint(checkpoint)
+    tasks = [
+        (solver_name, sudoku_id, run_id)
+        for sudoku_id in range(len(puzzles))
+        for run_id in range(num_runs)
+        for solver_name in solvers
+        if (solver_name, sudoku_id, run_id) not in done
+    ]
 
-def _run_exp(solver_cls, solver_name, cnfs, warmup_rounds):
-    res_df = pd.DataFrame(
-        columns=["algorithm", "run_id", "sudoku_id", "exec_time", "branch_count"]
+    jobs = jobs or multiprocessing.cpu_count()
+    initargs = (puzzles, solvers, WARMUP_ROUNDS, task_timeout, task_profile)
+    with open(checkpoint, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if f.tell() == 0:
+            writer.writeheader()
+        if tasks and jobs == 1:
+            init_worker(*initargs)
+            write_rows(f, writer, map(run_task, tasks))
+        elif tasks:
+            with multiprocessing.Pool(
+                jobs, initializer=init_worker, initargs=initargs
+            ) as pool:
+                chunksize = max(1, min(16, len(tasks) // (4 * jobs)))
+                write_rows(f, writer, pool.imap_unordered(run_task, tasks, chunksize))
+
+    res_df = pd.read_csv(checkpoint)
+    res_df = res_df[
+        res_df["algorithm"].isin(solvers)
+        & (res_df["sudoku_id"] < len(puzzles))
+        & (res_df["run_id"] < num_runs)
+    ]
+    # CDCL has no branch count, the others stay integers next to its blanks
+    res_df = res_df.assign(
+        algorithm=pd.Categorical(res_df["algorithm"], solvers),
+        branch_count=res_df["branch_count"].astype("Int64"),
     )
+    res_df = res_df.sort_values(["algorithm", "sudoku_id", "run_id"])
+    res_df["algorithm"] = res_df["algorithm"].astype(str)
+    return res_df.reset_index(drop=True)
 
-    for i, cnf in enumerate(cnfs):
-        for _ in range(warmup_rounds):
-            solver = solver_cls(cnf)
-            result = solver.solve()
-
-        for run_id in range(NUM_RUNS):
-            solver = solver_cls(cnf)
-            result = solver.solve()
-
-            if not result[0]:
-                raise ValueError("Unsatisfiable CNF")
-
-            res_df = pd.concat(
-                [
-                    res_df,
-                    pd.DataFrame(
-                        {
-                            "algorithm": solver_name,
-                            "run_id": run_id,
-                            "sudoku_id": i,
-                            "exec_time": solver.exec_time,
-                            "branch_count": solver.branch_count,
-                        },
-                        index=[0],
-                    ),
-                ]
+
+def check_settings(path, settings, checkpoint):
+    """
+    Records the settings of a new experiment next to its checkpoint, or
+    checks that a resumed one uses the same.
+    """
+    if os.path.exists(path) and os.path.exists(checkpoint):
+        with open(path) as f:
+            recorded = json.load(f)
+        if recorded != settings:
+            raise ValueError(
+                f"{checkpoint} was recorded with {recorded}, not {settings}; "
+                "delete it to start over"
             )
+        return
+    if os.path.exists(checkpoint):
+        raise ValueError(f"{checkpoint} has no settings; delete it to start over")
+    with open(path, "w") as f:
+        json.dump(settings, f)
+
+
+def load_checkpoint(path):
+    """
+    Returns the (solver, sudoku_id, run_id) tasks recorded in a checkpoint.
+    A row cut short by an interruption is dropped from the file.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        lines = f.read().splitlines(keepends=True)
+    # every complete row ends its line, a cut one may still parse
+    if lines and not lines[-1].endswith("\n"):
+        lines.pop()
+    rows = [row for row in csv.DictReader(lines) if is_complete(row)]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return {
+        (row["algorithm"], int(row["sudoku_id"]), int(row["run_id"])) for row in rows
+    }
+
+
+def is_complete(row):
+    if row.get("algorithm") not in SOLVERS or row.get("status") not in STATUSES:
+        return False
+    try:
+        int(row["run_id"])
+        int(row["sudoku_id"])
+        for column in COLUMNS:
+            if column in ("algorithm", "status", "run_id", "sudoku_id"):
+                continue
+            # only CDCL has no branch count
+            if column != "branch_count" or row[column] != "":
+                float(row[column])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return True
+
+
+def write_rows(f, writer, rows):
+    for row in rows:
+        writer.writerow(row)
+        f.flush()
+
+
+def init_worker(
+    puzzles, solvers, warmup_rounds, task_timeout=None, task_profile=False
+):
+    global sudokus, timeout, profile
+
+    sudokus = puzzles
+    timeout = task_timeout
+    profile = task_profile
+    for n in {len(sudoku) for sudoku in sudokus}:
+        sudoku_rules(math.isqrt(n))
+    # the first solves of a process are slower, they are not measured
+    cnf = CNFClauseSet.from_sudoku(sudokus[0])
+    for solver_name in solvers:
+        for _ in range(warmup_rounds):
+            SOLVERS[solver_name](cnf, budget=Budget(time=timeout)).solve()
+
+
+def run_task(task):
+    solver_name, sudoku_id, run_id = task
+    cnf = CNFClauseSet.from_sudoku(sudokus[sudoku_id])
+    solver = SOLVERS[solver_name](cnf, budget=Budget(time=timeout))
+    solver.stats.timing = profile
+
+    sat, _ = solver.solve()
 
-    return res_df
+    if sat is False:
+        raise ValueError("Unsatisfiable CNF")
+    status = "TIMEOUT" if sat is UNKNOWN else "SAT"
+    return {
+        "algorithm": solver_name,
+        "run_id": run_id,
+        "sudoku_id": sudoku_id,
+        "exec_time": solver.exec_time,
+        "branch_count": getattr(solver, "branch_count", None),
+        "status": status,
+        **solver.stats.as_dict(),
+    }
 
 
 if __name__ == "__main__":
@@ -1,4 +1,3 @@
-import sys
 import numpy as np
 import pandas as pd
 import random
@@ -6,8 +5,6 @@ import random
 from src.cnf import CNFClauseSet
 from src.utils import print_sudoku
 
-sys.setrecursionlimit(5000)
-
 def main():
     # MAKE DATASETS
 
@@ -1,8 +1,16 @@
 import argparse
+import math
+import multiprocessing
 
-from src.cnf import CNFClauseSet
-from src.dpll_random import DPLLRandom
-from src.dpll_dlis import DPLLDLIS
+from src.budget import UNKNOWN, add_budget_arguments, budget_from_args
+from src.cnf import CNFClauseSet, sudoku_rules
+from src.portfolio import SOLVERS, Portfolio
+from src.sudoku import presolve_sudoku
+
+# solver class, encoding and budget of the current process, set by init_worker
+dpll_cls = None
+presolve = False
+budget = None
 
 
 def main():
@@ -11,23 +19,27 @@ def main():
     parser.add_argument(
         "method",
         type=str,
-        choices=["random", "dlis", "cdcl"],
+        choices=list(SOLVERS) + ["portfolio"],
         default="random",
         nargs="?",
         help="Method to use for DPLL",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes, 0 uses every core",
+    )
+    parser.add_argument(
+        "--presolve",
+        action="store_true",
+        help="Place the givens, naked and hidden singles before encoding the puzzle",
+    )
+    add_budget_arguments(parser)
     args = parser.parse_args()
-
-    # Choose algorithm
-    method = args.method
-    if method == "random":
-        dpll_cls = DPLLRandom
-    elif method == "dlis":
-        dpll_cls = DPLLDLIS
-    elif method == "cdcl":
-        raise NotImplementedError
-    else:
-        raise ValueError("Invalid method")
+    if args.method == "portfolio" and args.jobs != 1:
+        # pool workers are daemons and cannot start the portfolio processes
+        parser.error("the portfolio method already runs in parallel, use --jobs 1")
 
     # Read the sudoku file
     filename = args.filename
@@ -37,21 +49,63 @@ def main():
         for line in f.readlines():
             sudokus.append(line.strip())
 
-    results = []
-    # Parse and solve sudoku
-    for sudoku in sudokus:
-        cnf = CNFClauseSet.from_sudoku(sudoku)
-        dpll = dpll_cls(cnf)
-        result = dpll.solve()
-        results.append(result)
+    # Parse the rules once, forked workers inherit them instead of receiving
+    # a CNF per puzzle
+    sizes = {math.isqrt(len(sudoku)) for sudoku in sudokus}
+    initargs = (args.method, sizes, args.presolve, budget_from_args(args))
+    init_worker(*initargs)
 
+    jobs = args.jobs or multiprocessing.cpu_count()
     filename_noext = filename.split(".")[0]
     with open(f"{filename_noext}.out", "w") as f:
-        for result in results:
-            if result[0]:
-                f.write(f"{result[1]}\n")
-            else:
-                f.write("UNSAT\n")
+        if jobs == 1:
+            write_results(f, map(solve, sudokus))
+            return
+        with multiprocessing.Pool(
+            jobs, initializer=init_worker, initargs=initargs
+        ) as pool:
+            # results arrive in input order, each one as soon as it and all
+            # the puzzles before it are solved
+            chunksize = max(1, min(16, len(sudokus) // (4 * jobs)))
+            write_results(f, pool.imap(solve, sudokus, chunksize))
+
+
+def init_worker(method, sizes, presolved=False, solve_budget=None):
+    global dpll_cls, presolve, budget
+
+    # Choose algorithm
+    if method == "portfolio":
+        dpll_cls = Portfolio
+    else:
+        dpll_cls = SOLVERS[method]
+
+    # presolved puzzles are encoded without the shared rules
+    presolve = presolved
+    budget = solve_budget
+    if not presolve:
+        for n in sizes:
+            sudoku_rules(n)
+
+
+def solve(sudoku):
+    # Parse and solve sudoku
+    if presolve:
+        cnf = presolve_sudoku(sudoku)
+    else:
+        cnf = CNFClauseSet.from_sudoku(sudoku)
+    dpll = dpll_cls(cnf, budget=budget)
+    return dpll.solve()
+
+
+def write_results(f, results):
+    for result in results:
+        if result[0]:
+            f.write(f"{result[1]}\n")
+        elif result[0] is UNKNOWN:
+            f.write("UNKNOWN\n")
+        else:
+            f.write("UNSAT\n")
+        f.flush()
 
 
 if __name__ == "__main__":
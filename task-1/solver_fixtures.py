@@ -0,0 +1,19 @@
+import os
+
+from src.portfolio import SOLVERS
+
+
+class CrashingSolver:
+    """
+    Solver whose process exits without answering, registered as "crash" in
+    every process that imports this module.
+    """
+
+    def __init__(self, cnf, budget=None):
+        pass
+
+    def solve(self):
+        os._exit(1)
+
+
+SOLVERS["crash"] = CrashingSolver
@@ -0,0 +1,140 @@
+import math
+from typing import Dict, List, Tuple, Type
+
+import numpy as np
+
+from src.cnf import CNFClauseSet, sudoku_rules
+from src.dpll import DPLL
+from src.dpll_dlis import DPLLDLIS
+from src.utils import Model, encode_literal, is_blank, parse_value
+
+# propagation status of every instance
+OPEN, SAT, UNSAT = 0, 1, 2
+
+
+class BatchPropagator:
+    """
+    Unit propagation of many instances of the same clause set at once.
+
+    The assignments of B instances form a B x V int8 matrix over a dense
+    variable index (1 true, -1 false, 0 unassigned). Clauses are grouped by
+    length into C x L matrices of variable columns and signs, so one sweep
+    evaluates every clause of every instance with a few array operations.
+    """
+
+    def __init__(self, rules: CNFClauseSet):
+        self.variables = sorted(rules.variables())
+        self.index: Dict[int, int] = {var: i for i, var in enumerate(self.variables)}
+        lookup = np.zeros(self.variables[-1] + 1, dtype=np.int64)
+        lookup[self.variables] = np.arange(len(self.variables))
+        by_length: Dict[int, List[List[int]]] = {}
+        for clause in rules.clauses:
+            by_length.setdefault(len(clause), []).append(clause)
+        # (columns, signs) per clause length
+        self.groups: List[Tuple[np.ndarray, np.ndarray]] = []
+        for clauses in by_length.values():
+            literals = np.array(clauses, dtype=np.int64)
+            signs = np.sign(literals).astype(np.int8)
+            self.groups.append((lookup[np.abs(literals)], signs))
+
+    def assignments(self, units: List[List[int]]) -> np.ndarray:
+        """
+        Returns the assignment matrix with the unit literals of every
+        instance assigned.
+        """
+        values = np.zeros((len(units), len(self.variables)), dtype=np.int8)
+        for b, literals in enumerate(units):
+            for lit in literals:
+                values[b, self.index[abs(lit)]] = 1 if lit > 0 else -1
+        return values
+
+    def propagate(self, values: np.ndarray) -> np.ndarray:
+        """
+        Assigns unit literals in every open instance until none is left,
+        updating values in place. Returns the status of every instance.
+        """
+        status = np.full(len(values), OPEN, dtype=np.int8)
+        rows = np.arange(len(values))
+        while len(rows):
+            current = values[rows]
+            changed = np.zeros(len(rows), dtype=bool)
+            satisfied = np.ones(len(rows), dtype=bool)
+            conflict = np.zeros(len(rows), dtype=bool)
+            for columns, signs in self.groups:
+                # literal values: 1 true, -1 false, 0 unassigned
+                literals = current[:, columns] * signs
+                free = literals == 0
+                open_clauses = ~(literals == 1).any(axis=2)
+                free_count = free.sum(axis=2)
+                satisfied &= ~open_clauses.any(axis=1)
+                conflict |= (open_clauses & (free_count == 0)).any(axis=1)
+
+                b, c = np.nonzero(open_clauses & (free_count == 1))
+                if len(b):
+                    k = free[b, c].argmax(axis=1)
+                    # clashing units leave a falsified clause for the next sweep
+                    current[b, columns[c, k]] = signs[c, k]
+                    changed[b] = True
+
+            values[rows] = current
+            status[rows[conflict]] = UNSAT
+            status[rows[satisfied & ~conflict]] = SAT
+            rows = rows[changed & ~conflict & ~satisfied]
+        return status
+
+    def model(self, values: np.ndarray) -> Model:
+        return {
+            self.variables[i]: bool(value > 0)
+            for i, value in enumerate(values)
+            if value != 0
+        }
+
+
+# propagators by the id of the shared rules they were built from
+_propagators: Dict[int, BatchPropagator] = {}
+
+
+def solve_sudokus(
+    sudokus: List[str], solver_cls: Type[DPLL] = DPLLDLIS
+) -> List[Tuple[bool, Model]]:
+    """
+    Solves puzzles of the same size together: the givens of all of them are
+    propagated over the shared rules in one batch, and only the puzzles
+    propagation does not decide are searched by solver_cls, starting from
+    the propagated assignment.
+    """
+    if not sudokus:
+        return []
+    n = math.isqrt(len(sudokus[0]))
+    if any(len(sudoku) != n * n for sudoku in sudokus):
+        raise ValueError("All sudokus of a batch must have the same size")
+    rules = sudoku_rules(n)
+    if id(rules) not in _propagators:
+        _propagators[id(rules)] = BatchPropagator(rules)
+    propagator = _propagators[id(rules)]
+
+    givens = [
+        [
+            encode_literal(i // n + 1, i % n + 1, parse_value(c), n)
+            for i, c in enumerate(sudoku)
+            if not is_blank(c)
+        ]
+        for sudoku in sudokus
+    ]
+    values = propagator.assignments(givens)
+    status = propagator.propagate(values)
+
+    results = []
+    for b in range(len(sudokus)):
+        if status[b] == UNSAT:
+            results.append((False, None))
+            continue
+        model = propagator.model(values[b])
+        if status[b] == SAT:
+            results.append((True, model))
+            continue
+        cnf = CNFClauseSet(base=rules)
+        for var, value in model.items():
+            cnf.add_clause([var if value else -var])
+        results.append(solver_cls(cnf).solve())
+    return results
@@ -0,0 +1,187 @@
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from src.budget import UNKNOWN, Budget
+from src.cnf import CNFClauseSet
+from src.portfolio import SOLVERS
+
+
+def datasets(path: str = "data") -> List[str]:
+    """
+    Puzzle files in the data directory, one sudoku per line.
+    """
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.endswith(".txt") and not name.startswith("sudoku-rules")
+    )
+
+
+def machine_fingerprint() -> Dict[str, object]:
+    """
+    Describes the machine and the code a benchmark ran on, results are only
+    comparable between runs with the same fingerprint.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "commit": commit,
+    }
+
+
+def benchmark_dataset(
+    path: str,
+    solvers: List[str],
+    repeat: int = 5,
+    warmup: int = 1,
+    limit: Optional[int] = None,
+    phases: bool = True,
+    timeout: Optional[float] = None,
+) -> List[Dict[str, object]]:
+    """
+    Solves the puzzles of a dataset with every solver, repeat times after
+    warmup untimed runs, and returns one record per timed run with the
+    statistics of the solver. Times are in nanoseconds. Phase timing adds a
+    little overhead to the solve time, it can be turned off to measure the
+    bare solvers.
+
+    Every solve, warmups included, is stopped after timeout seconds. A run
+    stopped this way is recorded with status TIMEOUT and the solver is not
+    run again on that puzzle.
+    """
+    for name in solvers:
+        if name not in SOLVERS:
+            raise ValueError(f"Invalid solver: {name}")
+
+    start = time.perf_counter_ns()
+    with open(path) as f:
+        sudokus = [line.strip() for line in f if line.strip()]
+    parse_ns = time.perf_counter_ns() - start
+    if limit is not None:
+        sudokus = sudokus[:limit]
+
+    records = []
+    for sudoku_id, sudoku in enumerate(sudokus):
+        start = time.perf_counter_ns()
+        cnf = CNFClauseSet.from_sudoku(sudoku)
+        encode_ns = time.perf_counter_ns() - start
+
+        for name in solvers:
+            runs = []
+            for _ in range(warmup):
+                run = solve(SOLVERS[name], cnf, timeout, phases)
+                if run[1] is UNKNOWN:
+                    # a warmup stopped by the timeout is the only run recorded
+                    runs.append(run)
+                    break
+            else:
+                for _ in range(repeat):
+                    runs.append(solve(SOLVERS[name], cnf, timeout, phases))
+                    if runs[-1][1] is UNKNOWN:
+                        break
+            for run_id, (solver, sat, solve_ns) in enumerate(runs):
+                times = solver.stats.times
+                records.append(
+                    {
+                        "dataset": os.path.basename(path),
+                        "solver": name,
+                        "sudoku_id": sudoku_id,
+                        "run_id": run_id,
+                        "sat": sat,
+                        "status": status(sat),
+                        "parse_ns": parse_ns,
+                        "encode_ns": encode_ns,
+                        "solve_ns": solve_ns,
+                        "branch_count": getattr(solver, "branch_count", None),
+                        **solver.stats.counts,
+                        **{f"{phase}_ns": ns for phase, ns in times.items()},
+                    }
+                )
+    return records
+
+
+def solve(solver_class, cnf: CNFClauseSet, timeout: Optional[float], phases: bool):
+    """
+    Runs one solve, returns the solver, its result and the solve time.
+    """
+    solver = solver_class(cnf, budget=Budget(time=timeout))
+    solver.stats.timing = phases
+    start = time.perf_counter_ns()
+    sat, _ = solver.solve()
+    return solver, sat, time.perf_counter_ns() - start
+
+
+def status(sat: Optional[bool]) -> str:
+    if sat is UNKNOWN:
+        return "TIMEOUT"
+    return "SAT" if sat else "UNSAT"
+
+
+def summarize(records: List[Dict[str, object]]) -> Dict[str, Dict[str, float]]:
+    """
+    Solve time statistics per dataset and solver, keyed "dataset/solver".
+    The times are those of the runs that finished, runs stopped by the
+    timeout are only counted. Without a finished run the times are None.
+    """
+    groups: Dict[str, List[int]] = {}
+    timeouts: Dict[str, int] = {}
+    for record in records:
+        key = f"{record['dataset']}/{record['solver']}"
+        groups.setdefault(key, [])
+        timeouts.setdefault(key, 0)
+        if record["status"] == "TIMEOUT":
+            timeouts[key] += 1
+        else:
+            groups[key].append(record["solve_ns"])
+    return {
+        key: {
+            "runs": len(times) + timeouts[key],
+            "timeouts": timeouts[key],
+            "min_ns": min(times, default=None),
+            "median_ns": statistics.median(times) if times else None,
+            "mean_ns": statistics.fmean(times) if times else None,
+            "stdev_ns": statistics.stdev(times) if len(times) > 1 else 0.0,
+        }
+        for key, times in groups.items()
+    }
+
+
+def regressions(
+    summary: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = 1.1,
+) -> Dict[str, float]:
+    """
+    Returns the ratio to the baseline of the median solve times that grew by
+    more than threshold, for the dataset/solver pairs present in both. A
+    pair with more timeouts than in the baseline has an infinite ratio.
+    """
+    slower = {}
+    for key, stats in summary.items():
+        if key not in baseline:
+            continue
+        if stats.get("timeouts", 0) > baseline[key].get("timeouts", 0):
+            slower[key] = float("inf")
+            continue
+        if not stats["median_ns"] or not baseline[key]["median_ns"]:
+            continue
+        ratio = stats["median_ns"] / baseline[key]["median_ns"]
+        if ratio > threshold:
+            slower[key] = ratio
+    return slower
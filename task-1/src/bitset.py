@@ -0,0 +1,189 @@
+from typing import Dict, List, Tuple
+
+from src.cnf import CNFClauseSet
+from src.utils import Model
+
+
+class BitsetCNF:
+    """
+    DPLL search state over bitsets.
+
+    Variables get a dense index and every clause is a pair of Python int
+    masks of its positive and negative variables. The assignment is kept as
+    masks of the true and the false variables, so whether a clause is
+    satisfied, unit or conflicting is a couple of bitwise operations, and
+    pure literals fall out of the union of the masks of the open clauses.
+
+    `model` is kept alongside the masks for the heuristics. The residual
+    `clauses` are rebuilt from the masks when they are read after a change,
+    a pass over the whole formula, so DPLL refuses this engine for the
+    heuristics reading them at every decision.
+    """
+
+    def __init__(self, cnf: CNFClauseSet):
+        self.variables = sorted(cnf.variables())
+        self.bits: Dict[int, int] = {var: 1 << i for i, var in enumerate(self.variables)}
+        self.model: Model = {}
+        self.trail: List[int] = []
+        # (trail length, open clause count) at the start of every level
+        self.levels: List[Tuple[int, int]] = []
+        self.true = 0
+        self.false = 0
+        self.positive: List[int] = []
+        self.negative: List[int] = []
+        # clauses containing every variable, in either polarity
+        self.occurrences: Dict[int, List[int]] = {}
+        # clause ids, the first `size` ones are unsatisfied and satisfied
+        # ones are swapped behind them
+        self.order: List[int] = []
+        self.position: List[int] = []
+        self.size = 0
+        self.units: List[int] = []
+        self.conflict = False
+        self._residual = None
+
+        for clause in cnf.clauses:
+            positive = negative = 0
+            for literal in clause:
+                if literal > 0:
+                    positive |= self.bits[literal]
+                else:
+                    negative |= self.bits[-literal]
+            # tautologies are satisfied by every assignment
+            if positive & negative:
+                continue
+            cid = len(self.positive)
+            self.positive.append(positive)
+            self.negative.append(negative)
+            self.position.append(len(self.order))
+            self.order.append(cid)
+            self.size += 1
+            for var in set(map(abs, clause)):
+                self.occurrences.setdefault(var, []).append(cid)
+            if positive == negative == 0:
+                self.conflict = True
+            elif (positive | negative) & ((positive | negative) - 1) == 0:
+                self.units.append(cid)
+
+    @property
+    def clauses(self) -> List[List[int]]:
+        """
+        Unsatisfied clauses without their false literals.
+        """
+        if self._residual is None:
+            free = ~(self.true | self.false)
+            self._residual = [
+                self._literals(self.positive[cid] & free, self.negative[cid] & free)
+                for cid in self.order[: self.size]
+            ]
+        return self._residual
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def decision_level(self) -> int:
+        return len(self.levels)
+
+    def decide(self, literal: int) -> bool:
+        self.levels.append((len(self.trail), self.size))
+        return self.assign(literal)
+
+    def assign(self, literal: int) -> bool:
+        """
+        Assigns the literal, closing the clauses it satisfies and queueing
+        the ones it leaves unit. Returns False on conflict.
+        """
+        var = abs(literal)
+        bit = self.bits[var]
+        self.model[var] = literal > 0
+        self.trail.append(literal)
+        if literal > 0:
+            self.true |= bit
+            satisfying = self.positive
+        else:
+            self.false |= bit
+            satisfying = self.negative
+        self._residual = None
+
+        assigned = self.true | self.false
+        for cid in self.occurrences.get(var, ()):
+            if self.position[cid] >= self.size:
+                continue
+            if satisfying[cid] & bit:
+                self._close(cid)
+                continue
+            free = (self.positive[cid] | self.negative[cid]) & ~assigned
+            if free == 0:
+                self.conflict = True
+            elif free & (free - 1) == 0:
+                self.units.append(cid)
+        return not self.conflict
+
+    def propagate(self) -> bool:
+        """
+        Assigns unit clauses until none are left. Returns False on conflict.
+        """
+        while self.units and not self.conflict:
+            cid = self.units.pop()
+            if self.position[cid] >= self.size:
+                continue
+            free = ~(self.true | self.false)
+            positive = self.positive[cid] & free
+            negative = self.negative[cid] & free
+            if (positive | negative) & ((positive | negative) - 1) == 0:
+                if positive | negative == 0:
+                    self.conflict = True
+                else:
+                    self.assign(self._literals(positive, negative)[0])
+        return not self.conflict
+
+    def assign_pure_literals(self) -> bool:
+        """
+        Assigns every variable that occurs in the open clauses with one
+        polarity only. Returns True if any literal was assigned.
+        """
+        positive = negative = 0
+        for cid in self.order[: self.size]:
+            positive |= self.positive[cid]
+            negative |= self.negative[cid]
+        free = ~(self.true | self.false)
+        positive &= free
+        negative &= free
+        pure = self._literals(positive & ~negative, negative & ~positive)
+        for literal in pure:
+            self.assign(literal)
+        return len(pure) > 0
+
+    def backtrack(self) -> None:
+        """
+        Undoes every assignment made since the last decision.
+        """
+        trail_length, size = self.levels.pop()
+        while len(self.trail) > trail_length:
+            var = abs(self.trail.pop())
+            del self.model[var]
+            self.true &= ~self.bits[var]
+            self.false &= ~self.bits[var]
+        # the clauses satisfied since then sit right behind the open ones
+        self.size = size
+        self.units.clear()
+        self.conflict = False
+        self._residual = None
+
+    def _close(self, cid: int) -> None:
+        # swap the clause with the last open one
+        self.size -= 1
+        pos = self.position[cid]
+        last = self.order[self.size]
+        self.order[pos], self.order[self.size] = last, cid
+        self.position[last], self.position[cid] = pos, self.size
+
+    def _literals(self, positive: int, negative: int) -> List[int]:
+        literals = []
+        for mask, sign in ((positive, 1), (negative, -1)):
+            while mask:
+                low = mask & -mask
+                literals.append(sign * self.variables[low.bit_length() - 1])
+                mask ^= low
+        return literals
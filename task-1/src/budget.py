@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+STATM_PATH = "/proc/self/statm"
+
+# result of a solve stopped by its budget, next to True (SAT) and False (UNSAT)
+UNKNOWN = None
+
+# checks between two reads of the memory usage, which costs a system call
+MEMORY_INTERVAL = 64
+
+
+class Budget:
+    """
+    Limits on a single solve: wall time in seconds, branches (DPLL),
+    conflicts (CDCL) and memory in bytes the solve may add to the resident
+    memory of the process, measured from when it starts. None means no
+    limit.
+
+    Solvers call start when they begin and check exhausted at every step of
+    the search. Once a limit is hit, `exceeded` names it and the solver
+    returns UNKNOWN with the statistics gathered so far.
+    """
+
+    def __init__(
+        self,
+        time: Optional[float] = None,
+        branches: Optional[int] = None,
+        conflicts: Optional[int] = None,
+        memory: Optional[int] = None,
+    ):
+        if memory is not None and memory_usage() is None:
+            raise ValueError("Memory budgets are not supported on this platform")
+        self.time = time
+        self.branches = branches
+        self.conflicts = conflicts
+        self.memory = memory
+        self.exceeded: Optional[str] = None
+        self.deadline = None
+        self.checks = 0
+        self.baseline = 0
+
+    def start(self) -> None:
+        self.exceeded = None
+        self.checks = 0
+        if self.memory is not None:
+            self.baseline = memory_usage()
+        self.deadline = None if self.time is None else time.perf_counter() + self.time
+
+    def exhausted(self, branches: int = 0, conflicts: int = 0) -> bool:
+        """
+        Returns True once any limit is reached.
+        """
+        if self.branches is not None and branches >= self.branches:
+            self.exceeded = "branches"
+        elif self.conflicts is not None and conflicts >= self.conflicts:
+            self.exceeded = "conflicts"
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.exceeded = "time"
+        elif self.memory is not None:
+            self.checks += 1
+            if (
+                self.checks % MEMORY_INTERVAL == 0
+                and memory_usage() - self.baseline >= self.memory
+            ):
+                self.exceeded = "memory"
+        return self.exceeded is not None
+
+
+def memory_usage() -> Optional[int]:
+    """
+    Resident memory of the process in bytes, None if it cannot be measured.
+    Without /proc or psutil this is the peak since the process started,
+    which does not go down when a solve frees memory.
+    """
+    if os.path.exists(STATM_PATH):
+        with open(STATM_PATH) as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes everywhere but on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+def add_budget_arguments(parser) -> None:
+    """
+    Adds the options of a Budget to an argparse parser.
+    """
+    parser.add_argument("--timeout", type=float, help="Seconds a solve may take")
+    parser.add_argument(
+        "--max-branches", type=int, help="Branches a DPLL solve may take"
+    )
+    parser.add_argument(
+        "--max-conflicts", type=int, help="Conflicts a CDCL solve may take"
+    )
+    parser.add_argument(
+        "--max-memory", type=int, help="Megabytes of memory a solve may add"
+    )
+
+
+def budget_from_args(args) -> Budget:
+    memory = None if args.max_memory is None else args.max_memory * 1024 * 1024
+    return Budget(args.timeout, args.max_branches, args.max_conflicts, memory)
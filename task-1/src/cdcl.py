@@ -1,106 +1,346 @@
-from typing import List, Tuple, Optional
+import time
+from typing import Dict, List, Tuple, Optional, Set
+
+from src.budget import UNKNOWN, Budget
+from src.heap import IndexedHeap
+from src.learned import LearnedClauses
+from src.restarts import RESTARTS
+from src.stats import Statistics
+from src.utils import Model
+from src.watched import WatchedClauses
 
 
 class CDCL:
-    def __init__(self, cnf):
+    def __init__(
+        self,
+        cnf,
+        var_decay: float = 0.95,
+        restart: str = "luby",
+        budget: Optional[Budget] = None,
+    ):
         """
         Initializes the CDCL solver with a CNF formula.
+        var_decay is the VSIDS activity decay applied after every conflict.
+        restart is the restart policy, one of RESTARTS.
+        budget limits the solve, which returns UNKNOWN once it is exhausted.
         """
+        if restart not in RESTARTS:
+            raise ValueError(f"Invalid restart policy: {restart}")
         self.cnf = cnf
         self.assignment = []
-        self.learned_clauses = []
+        self.values: Model = {}
+        # implication graph: decision level and reason clause id per variable,
+        # decisions and top level facts have no reason
+        self.levels: Dict[int, int] = {}
+        self.reasons: Dict[int, Optional[int]] = {}
+        self.learned_clauses = LearnedClauses()
         self.decision_level = 0
-        self.decision_stack = []
+        # assignment length at the start of every decision level
+        self.trail_lim: List[int] = []
+        self.watched = WatchedClauses()
+        # clauses not yet attached to the watch lists, with the LBD of the
+        # learned ones
+        self.pending = [(list(clause), None) for clause in cnf.clauses]
+        # index of the next assignment to propagate
+        self.head = 0
+        self.variables = cnf.variables()
+        # VSIDS: activities grow by var_inc, which grows after every conflict
+        # so older bumps decay exponentially
+        self.activity: Dict[int, float] = {var: 0.0 for var in self.variables}
+        self.var_inc = 1.0
+        self.var_decay = var_decay
+        self.order = IndexedHeap(self.activity, sorted(self.variables))
+        # last value of every unassigned variable (phase saving)
+        self.phases: Dict[int, bool] = {}
+        self.restart_policy = RESTARTS[restart]()
+        self.budget = budget or Budget()
+        self.exec_time = 0
+        self.stats = Statistics()
+
+    @property
+    def conflicts(self) -> int:
+        return self.stats["conflicts"]
+
+    @property
+    def restarts(self) -> int:
+        return self.stats["restarts"]
 
-    def solve(self) -> Tuple[bool, List[int]]:
+    def solve(self) -> Tuple[bool, Model]:
         """
         Main CDCL solving loop.
-        Returns a tuple: (SAT/UNSAT, assignments).
+        Returns a tuple: (SAT/UNSAT/UNKNOWN, model).
+        """
+        start_time = time.perf_counter()
+        self.budget.start()
+        self.stats.instrument(self)
+        res = self.search()
+        self.exec_time = time.perf_counter() - start_time
+        return res
+
+    def search(self) -> Tuple[bool, Model]:
+        """
+        Propagates, learns from conflicts and decides until every variable
+        is assigned, the formula is UNSAT or the budget is exhausted.
         """
         while True:
+            if self.budget.exhausted(conflicts=self.conflicts):
+                return UNKNOWN, None
+            assigned = len(self.assignment)
             conflict_clause = self.unit_propagate()
-            if conflict_clause:
+            self.stats.record("propagations", self, len(self.assignment) - assigned)
+            if conflict_clause is not None:
                 if self.decision_level == 0:
-                    return False, []  # UNSAT: No backtracking possible
-                learned_clause = self.analyze_conflict(conflict_clause)
-                self.learn_clause(learned_clause)
-                self.backtrack_to_level(learned_clause)
+                    return False, None  # UNSAT: No backtracking possible
+                learned_clause, level = self.analyze_conflict(conflict_clause)
+                self.stats.record("conflicts", self)
+                lbd = self.lbd(learned_clause)
+                self.backtrack_to_level(level)
+                self.learn_clause(learned_clause, lbd)
+                if self.restart_policy.conflict(lbd) and self.decision_level > 0:
+                    # saved phases steer the search back to where it was
+                    self.stats.record("restarts", self)
+                    self.backtrack_to_level(0)
+                if self.learned_clauses.should_reduce(self.conflicts):
+                    self.reduce_learned()
             elif self.all_variables_assigned():
-                return True, self.assignment  # SAT: All variables assigned
+                return True, dict(self.values)  # SAT: All variables assigned
             else:
                 self.make_decision()
 
     def unit_propagate(self) -> Optional[List[int]]:
         """
-        Performs unit propagation. Assign values for unit clauses.
+        Performs unit propagation with watched literals: only the clauses
+        watching the negation of a new assignment are visited.
         Returns a conflicting clause if a conflict is detected.
         """
-        for clause in self.cnf.clauses:
-            unassigned = [
-                lit for lit in clause if abs(lit) not in map(abs, self.assignment)
-            ]
-            if len(unassigned) == 0:
-                # clause is unsatisfied under current assignments
-                if not any(lit in self.assignment for lit in clause):
-                    return clause  # Conflict detected
-            elif len(unassigned) == 1:
-                # found a unit clause; propagate its literal
-                self.assignment.append(unassigned[0])
-                self.decision_stack.append((unassigned[0], self.decision_level))
+        conflict_clause = self.attach_pending()
+        if conflict_clause is not None:
+            return conflict_clause
+
+        self.head, cid = self.watched.propagate(
+            self.values, self.assignment, self.head, self.assign
+        )
+        if cid is not None:
+            return self.watched.clauses[cid]
         return None  # no conflicts detected
 
-    def analyze_conflict(self, conflict_clause: List[int]) -> List[int]:
+    def attach_pending(self) -> Optional[List[int]]:
         """
-        Analyzes a conflict and derive a learned clause.
+        Adds pending clauses to the watch lists under the current assignment,
+        assigning the ones that are unit.
+        Returns a conflicting clause if one is already falsified.
         """
-        decision_literals = [lit for lit in self.assignment if -lit in conflict_clause]
-        # simplified conflict resolution logic (expand for UIP if needed)
-        learned_clause = list(
-            set(conflict_clause + [-lit for lit in decision_literals])
-        )
-        return learned_clause
+        while self.pending:
+            clause, lbd = self.pending.pop()
+            # watch non-false literals first, then the highest level ones
+            clause.sort(key=self.watch_rank)
+            cid = self.watched.add_clause(clause) if len(clause) >= 2 else None
+            if lbd is not None:
+                self.learned_clauses.add(clause, cid, lbd)
+            if not clause or self.literal_value(clause[0]) is False:
+                return clause
+            if self.literal_value(clause[0]) is None and (
+                len(clause) == 1 or self.literal_value(clause[1]) is False
+            ):
+                self.assign(clause[0], cid)
+        return None
+
+    def watch_rank(self, lit: int) -> Tuple[int, int]:
+        value = self.literal_value(lit)
+        if value is None:
+            return 1, 0
+        if value:
+            return 0, 0
+        return 2, -self.levels[abs(lit)]
 
-    def learn_clause(self, clause: List[int]):
+    def literal_value(self, lit: int) -> Optional[bool]:
+        value = self.values.get(abs(lit))
+        if value is None:
+            return None
+        return value == (lit > 0)
+
+    def assign(self, lit: int, reason: Optional[int] = None):
         """
-        Adds a learned clause to the CNF formula.
+        Records an assignment on the current decision level together with
+        the id of the clause that implied it.
         """
-        if clause not in self.cnf.clauses:
-            self.cnf.add_clause(clause)
-            self.learned_clauses.append(clause)
+        var = abs(lit)
+        self.values[var] = lit > 0
+        self.levels[var] = self.decision_level
+        self.reasons[var] = reason
+        self.assignment.append(lit)
 
-    def backtrack_to_level(self, learned_clause: List[int]):
+    def analyze_conflict(self, conflict_clause: List[int]) -> Tuple[List[int], int]:
         """
-        Backtracks to the highest decision level in the learned clause.
+        Derives the first-UIP clause by resolving the conflict clause with
+        the reasons of current level literals, newest first, until a single
+        current level literal is left. Returns the minimized clause with the
+        asserting literal first, and the level to backjump to.
         """
-        levels = [
-            level
-            for lit, level in self.decision_stack
-            if abs(lit) in map(abs, learned_clause)
+        seen: Set[int] = set()
+        learned_clause = []
+        pending = 0  # seen current level literals not yet resolved
+        clause, lit = conflict_clause, None
+        index = len(self.assignment) - 1
+
+        while True:
+            for other in clause:
+                var = abs(other)
+                if other == lit or var in seen or self.levels[var] == 0:
+                    continue
+                seen.add(var)
+                if self.levels[var] == self.decision_level:
+                    pending += 1
+                else:
+                    learned_clause.append(other)
+
+            while abs(self.assignment[index]) not in seen:
+                index -= 1
+            lit = self.assignment[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            cid = self.reasons[abs(lit)]
+            clause = self.watched.clauses[cid]
+            if cid in self.learned_clauses.lbd:
+                self.learned_clauses.update(cid, self.lbd(clause))
+
+        for var in seen:
+            self.bump_activity(var)
+        self.decay_activities()
+
+        cache: Dict[int, bool] = {}
+        learned_clause = [
+            other
+            for other in learned_clause
+            if not self.is_redundant(other, seen, cache)
         ]
-        target_level = max(levels) if levels else 0
-        self.decision_level = target_level
+        learned_clause.insert(0, -lit)
+
+        if len(learned_clause) == 1:
+            return learned_clause, 0
+        # second watch goes to the highest level literal, that is the level
+        # the clause becomes unit on
+        i = max(
+            range(1, len(learned_clause)),
+            key=lambda j: self.levels[abs(learned_clause[j])],
+        )
+        learned_clause[1], learned_clause[i] = learned_clause[i], learned_clause[1]
+        return learned_clause, self.levels[abs(learned_clause[1])]
+
+    def lbd(self, clause: List[int]) -> int:
+        """
+        Literal block distance: the number of distinct decision levels among
+        the literals of the clause.
+        """
+        return len({self.levels.get(abs(lit)) for lit in clause})
+
+    def bump_activity(self, var: int):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            # rescale to avoid overflow, the order stays the same
+            for other in self.activity:
+                self.activity[other] *= 1e-100
+            self.var_inc *= 1e-100
+        self.order.update(var)
+
+    def decay_activities(self):
+        self.var_inc /= self.var_decay
+
+    def is_redundant(self, lit: int, seen: Set[int], cache: Dict[int, bool]) -> bool:
+        """
+        Checks whether a learned literal is implied by the other literals
+        of the clause, following reasons back through the implication graph.
+        """
+        if self.reasons[abs(lit)] is None:
+            return False
+        stack, visited = [abs(lit)], {abs(lit)}
+        while stack:
+            reason = self.reasons[stack.pop()]
+            for other in self.watched.clauses[reason]:
+                var = abs(other)
+                if var in visited or var in seen or self.levels[var] == 0:
+                    continue
+                if cache.get(var) is True:
+                    continue
+                if self.reasons[var] is None or cache.get(var) is False:
+                    cache[abs(lit)] = False
+                    return False
+                visited.add(var)
+                stack.append(var)
+        for var in visited:
+            cache[var] = True
+        return True
 
-        # remove all assignments above the target decision level
-        while self.decision_stack and self.decision_stack[-1][1] > self.decision_level:
-            lit, level = self.decision_stack.pop()
-            self.assignment.remove(lit)
+    def learn_clause(self, clause: List[int], lbd: Optional[int] = None):
+        """
+        Adds a clause to the learned clause database unless it is already
+        there, the input formula is left unchanged. It is attached on the
+        next propagation, so after backjumping it asserts its first literal.
+        """
+        if clause in self.learned_clauses:
+            return
+        if lbd is None:
+            lbd = self.lbd(clause)
+        # recorded right away so a duplicate learned before the next
+        # propagation is rejected too
+        self.learned_clauses.add(clause)
+        self.pending.append((list(clause), lbd))
+        self.stats.record("learned", self)
+
+    def reduce_learned(self):
+        """
+        Deletes the learned clauses the database selects, keeping the ones
+        that are the reason of an assignment.
+        """
+        for cid in self.learned_clauses.reduce(self.is_locked):
+            self.watched.remove_clause(cid)
+
+    def is_locked(self, cid: int) -> bool:
+        # the literal a clause implied is always kept in its first position
+        return self.reasons.get(abs(self.watched.clauses[cid][0])) == cid
+
+    def backtrack_to_level(self, level: int):
+        """
+        Removes all assignments above the given decision level.
+        """
+        if level >= self.decision_level:
+            return
+        self.stats.record("backtracks", self, self.decision_level - level)
+        mark = self.trail_lim[level]
+        while len(self.assignment) > mark:
+            var = abs(self.assignment.pop())
+            self.phases[var] = self.values.pop(var)
+            del self.levels[var]
+            del self.reasons[var]
+            self.order.push(var)
+        del self.trail_lim[level:]
+        self.decision_level = level
+        self.head = len(self.assignment)
 
     def make_decision(self):
         """
-        Chooses an unassigned variable and assign it a value.
+        Chooses the unassigned variable with the highest VSIDS activity
+        and assigns it its saved phase.
+        """
+        while self.order:
+            var = self.order.pop()
+            if var not in self.values:
+                self.decide(var if self.phases.get(var, False) else -var)
+                return
+
+    def decide(self, lit: int):
+        """
+        Opens a new decision level and assigns the literal on it.
         """
-        unassigned_vars = {abs(lit) for clause in self.cnf.clauses for lit in clause}
-        unassigned_vars -= {abs(lit) for lit in self.assignment}
-        if unassigned_vars:
-            # default decision-making strategy (expand with heuristics if needed)
-            decision = next(iter(unassigned_vars))
-            self.assignment.append(decision)
-            self.decision_stack.append((decision, self.decision_level))
-            self.decision_level += 1
+        self.trail_lim.append(len(self.assignment))
+        self.decision_level += 1
+        self.assign(lit)
+        self.stats.record("decisions", self)
 
     def all_variables_assigned(self) -> bool:
         """
         Checks if all variables in the CNF formula are assigned.
         """
-        all_vars = {abs(lit) for clause in self.cnf.clauses for lit in clause}
-        return all_vars.issubset({abs(lit) for lit in self.assignment})
+        return len(self.values) == len(self.variables)
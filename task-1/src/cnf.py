@@ -1,34 +1,116 @@
 import math
-from typing import List, TypeAlias
-from src.utils import encode_literal
+import os
+import pickle
+import tempfile
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Set, TypeAlias
+from src.utils import encode_literal, is_blank, parse_value
 
 Clause: TypeAlias = List[int]
 
 
+class ClauseView(Sequence):
+    """
+    Read-only view of compact clause storage, every clause is returned as a
+    new list sliced from the flat literal buffer. The clauses of the base
+    set, if any, come first.
+    """
+
+    def __init__(self, cnf: "CNFClauseSet"):
+        self.cnf = cnf
+
+    def __len__(self):
+        size = len(self.cnf.offsets) - 1
+        if self.cnf.base is not None:
+            size += len(self.cnf.base)
+        return size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("clause index out of range")
+        base = self.cnf.base
+        if base is not None:
+            if i < len(base):
+                return base.clauses[i]
+            i -= len(base)
+        offsets = self.cnf.offsets
+        return self.cnf.literals[offsets[i] : offsets[i + 1]].tolist()
+
+    def __iter__(self):
+        if self.cnf.base is not None:
+            yield from self.cnf.base.clauses
+        # convert the buffer once instead of once per clause
+        literals = self.cnf.literals.tolist()
+        offsets = self.cnf.offsets
+        for i in range(len(offsets) - 1):
+            yield literals[offsets[i] : offsets[i + 1]]
+
+    def __str__(self):
+        return str(list(self))
+
+
 class CNFClauseSet:
-    def __init__(self, formula: List[List[int]] = None):
-        self.clauses = []
+    def __init__(
+        self,
+        formula: List[List[int]] = None,
+        compact: bool = False,
+        base: "CNFClauseSet" = None,
+    ):
+        """
+        With compact=True clauses are stored in a flat array of literals plus
+        an array of clause offsets, and `clauses` is a read-only view.
+        A frozen base is shared rather than copied, the set then only stores
+        the clauses added on top of it.
+        """
+        if base is not None and not base.frozen:
+            raise ValueError("Base clause set must be frozen")
+        self.compact = compact or base is not None
+        self.base = base
+        self.frozen = False
+        self._variables = None
+        if self.compact:
+            self.literals = array("i")
+            self.offsets = array("q", [0])
+            self.clauses = ClauseView(self)
+        else:
+            self.clauses = []
         if formula:
             for clause in formula:
                 self.add_clause(clause)
 
     @classmethod
-    def from_sudoku(cls, sudoku: str):
+    def from_sudoku(
+        cls,
+        sudoku: str,
+        compact: bool = True,
+        persist: bool = False,
+        dense: bool = False,
+        extended: bool = True,
+    ):
+        """
+        Encodes the sudoku with the rules from data/sudoku-rules-NxN.txt, or
+        with generated rules when dense=True or there is no such file.
+        """
         n = int(math.sqrt(len(sudoku)))
-        formula = []
-
-        with open(f"data/sudoku-rules-{n}x{n}.txt", "r") as f:
-            for line in f.readlines()[1:]:
-                formula.append(list(map(int, line.strip().split(" ")[:-1])))
+        rules = sudoku_rules(n, persist, dense, extended)
+        if compact:
+            cnf = cls(base=rules)
+        else:
+            cnf = cls(list(rules.clauses))
 
         for i, c in enumerate(sudoku):
-            if c != ".":
+            if not is_blank(c):
                 row = i // n + 1
                 col = i % n + 1
-                val = int(c, 17)
-                formula.append([encode_literal(row, col, val, n)])
+                val = parse_value(c)
+                cnf.add_clause([encode_literal(row, col, val, n, dense)])
 
-        return cls(formula)
+        return cnf
 
     def __len__(self):
         return len(self.clauses)
@@ -37,10 +119,163 @@ class CNFClauseSet:
         return str(self.clauses)
 
     def add_clause(self, clause: List[int]):
-        self.clauses.append(clause)
+        if self.frozen:
+            raise ValueError("Cannot add clauses to a frozen clause set")
+        if self.compact:
+            self.literals.extend(clause)
+            self.offsets.append(len(self.literals))
+        else:
+            self.clauses.append(clause)
+
+    def freeze(self):
+        """
+        Makes a compact set without a base immutable, so it can be shared.
+        """
+        if not self.compact or self.base is not None:
+            raise ValueError("Only compact sets without a base can be frozen")
+        self.frozen = True
+
+    def variables(self) -> Set[int]:
+        if self._variables is not None:
+            return set(self._variables)
+        if self.compact:
+            variables = set(map(abs, self.literals))
+            if self.base is not None:
+                variables |= self.base.variables()
+        else:
+            variables = {abs(literal) for clause in self.clauses for literal in clause}
+        if self.frozen:
+            self._variables = variables
+        return variables
 
     def remove_literal(self, literal: int):
+        if self.frozen:
+            raise ValueError("Cannot remove literals from a frozen clause set")
+        if self.compact:
+            clauses = list(self.clauses)
+            self.base = None
+            del self.literals[:]
+            del self.offsets[1:]
+            for clause in clauses:
+                self.add_clause([elem for elem in clause if abs(elem) != abs(literal)])
+            return
+
         for i in range(len(self.clauses)):
             self.clauses[i] = [
                 elem for elem in self.clauses[i] if abs(elem) != abs(literal)
             ]
+
+
+# rules by file path or generator arguments, shared by the puzzles of a size
+_rules_cache: Dict[str, CNFClauseSet] = {}
+
+
+def rules_path(n: int) -> str:
+    return f"data/sudoku-rules-{n}x{n}.txt"
+
+
+def sudoku_rules(
+    n: int, persist: bool = False, dense: bool = False, extended: bool = True
+) -> CNFClauseSet:
+    """
+    Returns the shared rules from_sudoku encodes an n x n sudoku with.
+    """
+    if dense or not os.path.exists(rules_path(n)):
+        return generate_sudoku_rules(n, extended, dense)
+    return load_sudoku_rules(n, persist)
+
+
+def load_sudoku_rules(n: int, persist: bool = False) -> CNFClauseSet:
+    """
+    Returns the frozen rules of an n x n sudoku, parsed once per process.
+    With persist=True the parsed arrays are also pickled next to the rules
+    file and read back from there as long as it is newer than the text.
+    """
+    path = rules_path(n)
+    if path in _rules_cache:
+        return _rules_cache[path]
+
+    rules = CNFClauseSet(compact=True)
+    pickle_path = os.path.splitext(path)[0] + ".pickle"
+    if (
+        persist
+        and os.path.exists(pickle_path)
+        and os.path.getmtime(pickle_path) >= os.path.getmtime(path)
+    ):
+        with open(pickle_path, "rb") as f:
+            literals, offsets = pickle.load(f)
+        rules.literals.extend(literals)
+        rules.offsets.extend(offsets[1:])
+    else:
+        with open(path, "r") as f:
+            for line in f.readlines()[1:]:
+                rules.add_clause(list(map(int, line.split()))[:-1])
+        if persist:
+            # other processes may be loading the rules at the same time, so
+            # the pickle only appears at its path once it is complete
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pickle_path) or ".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((rules.literals, rules.offsets), f)
+                os.replace(tmp_path, pickle_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    rules.freeze()
+    _rules_cache[path] = rules
+    return rules
+
+
+def generate_sudoku_rules(
+    n: int, extended: bool = True, dense: bool = False
+) -> CNFClauseSet:
+    """
+    Builds the frozen rules of an n x n sudoku, n = k^2, without reading a
+    file: every cell has a value and no value repeats in a row, column or
+    box. The extended encoding adds the redundant clauses the rule files
+    also contain: every cell has at most one value and every value occurs
+    in every row, column and box.
+    """
+    key = f"generated-{n}-{extended}-{dense}"
+    if key in _rules_cache:
+        return _rules_cache[key]
+
+    k = math.isqrt(n)
+    if k * k != n:
+        raise ValueError(f"Invalid sudoku size: {n}")
+
+    values = range(1, n + 1)
+    literals = {
+        (row, col): [encode_literal(row, col, val, n, dense) for val in values]
+        for row in values
+        for col in values
+    }
+    units = [[(row, col) for col in values] for row in values]
+    units += [[(row, col) for row in values] for col in values]
+    units += [
+        [(row + i, col + j) for i in range(k) for j in range(k)]
+        for row in range(1, n + 1, k)
+        for col in range(1, n + 1, k)
+    ]
+
+    rules = CNFClauseSet(compact=True)
+    for cell in literals.values():
+        rules.add_clause(cell)
+        if extended:
+            for i in range(n):
+                for j in range(i + 1, n):
+                    rules.add_clause([-cell[i], -cell[j]])
+
+    for unit in units:
+        for val in range(n):
+            unit_literals = [literals[cell][val] for cell in unit]
+            for i in range(n):
+                for j in range(i + 1, n):
+                    rules.add_clause([-unit_literals[i], -unit_literals[j]])
+            if extended:
+                rules.add_clause(unit_literals)
+
+    rules.freeze()
+    _rules_cache[key] = rules
+    return rules
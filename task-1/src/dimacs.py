@@ -0,0 +1,97 @@
+import gzip
+import lzma
+from array import array
+from typing import BinaryIO
+
+from src.cnf import CNFClauseSet
+
+# bytes that never occur in clause lines, only in comments and the header
+TEXT = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ%")
+
+
+def open_dimacs(filename: str) -> BinaryIO:
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    if filename.endswith(".xz"):
+        return lzma.open(filename, "rb")
+    return open(filename, "rb")
+
+
+def read_dimacs(filename: str, chunk_size: int = 1 << 20) -> CNFClauseSet:
+    """
+    Reads a DIMACS CNF file, optionally gzip or xz compressed, into compact
+    clause storage.
+
+    The file is tokenized in chunks of whole lines and literals go straight
+    into the flat literal array, so no per-clause lists are created. Clauses
+    may span lines and chunks, `c` comment lines are skipped and the clause
+    count of the `p cnf` header sizes the offset array up front.
+    """
+    cnf = CNFClauseSet(compact=True)
+    literals = cnf.literals
+    offsets = cnf.offsets
+    count = 0  # clauses read so far
+    tail = b""  # incomplete last line of the previous chunk
+    done = False
+
+    with open_dimacs(filename) as f:
+        while not done:
+            chunk = f.read(chunk_size)
+            data = tail + chunk
+            if not data:
+                break
+            if chunk:
+                cut = data.rfind(b"\n") + 1
+                data, tail = data[:cut], data[cut:]
+            else:
+                tail = b""
+            if not TEXT.isdisjoint(data):
+                data, clauses, done = _strip_text(data)
+                if clauses is not None and count == 0:
+                    offsets.extend(array("q", bytes(8 * clauses)))
+
+            numbers = array("i", map(int, data.split()))
+            # the i-th zero at position end closes a clause of end - i literals
+            ends = []
+            start = len(literals)
+            end = -1
+            while True:
+                try:
+                    end = numbers.index(0, end + 1)
+                except ValueError:
+                    break
+                ends.append(start + end - len(ends))
+            literals.extend(filter(None, numbers))
+            offsets[count + 1 : count + 1 + len(ends)] = array("q", ends)
+            count += len(ends)
+
+    del offsets[count + 1 :]
+    # tolerate a missing terminating 0 on the last clause
+    if len(literals) > offsets[-1]:
+        offsets.append(len(literals))
+    return cnf
+
+
+def _strip_text(data: bytes):
+    """
+    Removes comment and header lines from a chunk of whole lines. Returns the
+    remaining clause lines, the clause count of the header if any, and
+    whether the end of the formula was reached.
+    """
+    lines = []
+    clauses = None
+    for line in data.split(b"\n"):
+        token = line.lstrip()[:1]
+        if token == b"c":
+            continue
+        if token == b"p":
+            fields = line.split()
+            if len(fields) != 4 or fields[1] != b"cnf":
+                raise ValueError(f"Invalid DIMACS header: {line.decode()}")
+            clauses = int(fields[3])
+        elif token == b"%":
+            # end of formula marker of the SATLIB benchmarks
+            return b"\n".join(lines), clauses, True
+        else:
+            lines.append(line)
+    return b"\n".join(lines), clauses, False
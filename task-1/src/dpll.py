@@ -3,50 +3,166 @@ import time
 
 from abc import ABC, abstractmethod
 from copy import deepcopy
-from typing import Tuple
+from typing import List, Optional, Tuple
+from src.bitset import BitsetCNF
+from src.budget import UNKNOWN, Budget
 from src.cnf import CNFClauseSet
+from src.stats import Statistics
+from src.trail import TrailCNF
 from src.utils import Model
 
+# search states of DPLL, None branches on copies of the formula. They all
+# keep the residual formula, watched literals are only used by CDCL. The
+# bitset state rebuilds the residual clauses from its masks when they are
+# read, so it refuses the heuristics scanning them at every decision (DLIS
+# and dynamic Jeroslow-Wang), random and static Jeroslow-Wang do not
+ENGINES = {
+    "trail": TrailCNF,
+    "bitset": BitsetCNF,
+    "copy": None,
+}
+
 
 class DPLL(ABC):
-    def __init__(self, init_cnf: CNFClauseSet):
+    # whether choose_literal reads the residual clauses at every decision
+    # when there are no incremental scores on the search state
+    scans_clauses = False
+
+    def __init__(
+        self,
+        init_cnf: CNFClauseSet,
+        engine: str = "trail",
+        budget: Optional[Budget] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine: {engine}")
+        if engine == "bitset" and self.scans_clauses:
+            raise ValueError(
+                f"{type(self).__name__} scans the clauses at every decision, "
+                "which the bitset engine rebuilds; use the trail engine"
+            )
         self.cnf = init_cnf
+        self.engine = engine
+        # limits of a solve, an exhausted budget makes it return UNKNOWN
+        self.budget = budget or Budget()
         self.branch_count = 0
         self.exec_time = 0
+        self.stats = Statistics()
 
     def solve(self) -> Tuple[bool, Model]:
-        cnf = deepcopy(self.cnf)
-        start_time = time.time()
-        res = self.backtrack(cnf, {})
-        self.exec_time = time.time() - start_time
+        start_time = time.perf_counter()
+        self.budget.start()
+        self.stats.instrument(self)
+        if self.engine == "copy":
+            # the copying search edits clauses in place, so it needs lists
+            if self.cnf.compact:
+                cnf = CNFClauseSet(list(self.cnf.clauses))
+            else:
+                cnf = deepcopy(self.cnf)
+            res = self.backtrack(cnf, {})
+        else:
+            state = ENGINES[self.engine](self.cnf)
+            self.stats.instrument(state)
+            self.attach(state)
+            res = self.backtrack_trail(state)
+        self.exec_time = time.perf_counter() - start_time
         return res
 
-    # Returns a model if satisfiable, None otherwise
-    def backtrack(self, cnf: CNFClauseSet, model: Model) -> Tuple[bool, Model]:
-        self.remove_pure_unit(cnf, model)
+    # Called before the trail search starts, heuristics override it to keep
+    # incremental structures on the search state
+    def attach(self, state: TrailCNF) -> None:
+        pass
 
-        if len(cnf) == 0:
-            self.branch_count += 1
-            return True, model
+    # Same search as backtrack, but assignments are undone on the trail
+    # instead of branching on copies of the formula. The state is a TrailCNF
+    # or a BitsetCNF, both expose the residual formula as `clauses`.
+    # The decisions on the current path live on an explicit stack, so the
+    # search depth is not limited by the interpreter recursion limit.
+    def backtrack_trail(self, state: TrailCNF) -> Tuple[bool, Model]:
+        # decided literal and whether it is already the second branch
+        path: List[Tuple[int, bool]] = []
+        while True:
+            if self.budget.exhausted(self.branch_count):
+                return UNKNOWN, None
+            if self.simplify_trail(state):
+                if len(state) == 0:
+                    self.branch_count += 1
+                    return True, dict(state.model)
+
+                literal = self.choose_literal(state, state.model)
+                self.stats.record("decisions", self)
+                path.append((literal, False))
+                state.decide(literal)
+                continue
 
-        if any(len(clause) == 0 for clause in cnf.clauses):
             self.branch_count += 1
-            return False, None
-
-        literal = self.choose_literal(cnf, model)
-        cnf_left, model_left = deepcopy(cnf), deepcopy(model)
-        cnf_left.add_clause([literal])
-        left = self.backtrack(cnf_left, model_left)
-        if left[0]:
-            return True, left[1]
-
-        cnf_right, model_right = deepcopy(cnf), deepcopy(model)
-        cnf_right.add_clause([-literal])
-        right = self.backtrack(cnf_right, model_right)
-        if right[0]:
-            return True, right[1]
-
-        self.branch_count += 1
+            self.stats.record("conflicts", self)
+            # undo decisions up to the deepest one with an untried branch
+            while path:
+                literal, flipped = path.pop()
+                state.backtrack()
+                self.stats.record("backtracks", self)
+                if not flipped:
+                    path.append((-literal, True))
+                    state.decide(-literal)
+                    break
+                # both branches of this decision failed
+                self.branch_count += 1
+            else:
+                return False, None
+
+    # Unit propagation and pure literal elimination, False on conflict. Both
+    # count as propagations in the statistics
+    def simplify_trail(self, state: TrailCNF) -> bool:
+        assigned = len(state.trail)
+        consistent = state.propagate()
+        if consistent:
+            while state.assign_pure_literals():
+                pass
+        self.stats.record("propagations", self, len(state.trail) - assigned)
+        return consistent
+
+    # Returns a model if satisfiable, None otherwise. Branches waiting to be
+    # explored are kept on an explicit stack as the formula and model they
+    # start from plus the literal they add, and copied when they are popped.
+    def backtrack(self, cnf: CNFClauseSet, model: Model) -> Tuple[bool, Model]:
+        # a None formula marks a node whose branches have both failed
+        stack: List[Tuple[CNFClauseSet, Model, int]] = [(cnf, model, None)]
+        while stack:
+            if self.budget.exhausted(self.branch_count):
+                return UNKNOWN, None
+            cnf, model, literal = stack.pop()
+            if cnf is None:
+                self.branch_count += 1
+                # both branches failed, so did the decision leading here
+                if stack:
+                    self.stats.record("backtracks", self)
+                continue
+            if literal is not None:
+                cnf, model = deepcopy(cnf), deepcopy(model)
+                cnf.add_clause([literal])
+
+            assigned = len(model)
+            self.remove_pure_unit(cnf, model)
+            self.stats.record("propagations", self, len(model) - assigned)
+
+            if len(cnf) == 0:
+                self.branch_count += 1
+                return True, model
+
+            if any(len(clause) == 0 for clause in cnf.clauses):
+                self.branch_count += 1
+                self.stats.record("conflicts", self)
+                if literal is not None:
+                    self.stats.record("backtracks", self)
+                continue
+
+            literal = self.choose_literal(cnf, model)
+            self.stats.record("decisions", self)
+            stack.append((None, None, None))
+            stack.append((cnf, model, -literal))
+            stack.append((cnf, model, literal))
+
         return False, None
 
     # Remove pure literals and unit clauses
@@ -113,7 +229,8 @@ class DPLL(ABC):
     def fix_clauses(self, cnf: CNFClauseSet, model: Model) -> None:
         toremove = []
         for clause in cnf.clauses:
-            for literal in clause:
+            # iterate over a copy, false literals are removed from the clause
+            for literal in list(clause):
                 # If undetermined, skip
                 if abs(literal) not in model:
                     continue
@@ -134,5 +251,5 @@ class DPLL(ABC):
         return not ((literal > 0) ^ (model[abs(literal)]))
 
     @abstractmethod
-    def choose_literal(self, cnf: CNFClauseSet) -> int:
+    def choose_literal(self, cnf: CNFClauseSet, model: Model) -> int:
         pass
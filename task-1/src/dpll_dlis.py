@@ -1,26 +1,104 @@
-import random
+from typing import Dict, Iterable, List, Optional
 
+from src.budget import Budget
 from src.cnf import CNFClauseSet
 from src.dpll import DPLL
-from src.utils import Model, list_diff
+from src.heap import IndexedHeap
+from src.trail import ClauseListener, TrailCNF
+from src.utils import Model
 
 
-class DPLLDLIS(DPLL):
-    def __init__(self, init_cnf: CNFClauseSet):
-        super(DPLLDLIS, self).__init__(init_cnf)
-        literals_set = set()
-        for clause in init_cnf.clauses:
+def first_occurrences(clauses: Iterable[List[int]]) -> Dict[int, int]:
+    """
+    Rank of every variable in the order its positive literal first occurs in
+    the clauses, the variables never occurring positively come last.
+    """
+    ranks: Dict[int, int] = {}
+    variables = set()
+    for clause in clauses:
+        for literal in clause:
+            variables.add(abs(literal))
+            if literal > 0 and literal not in ranks:
+                ranks[literal] = len(ranks)
+    for var in sorted(variables - ranks.keys()):
+        ranks[var] = len(ranks)
+    return ranks
+
+
+class DLISCounts(ClauseListener):
+    """
+    Number of unsatisfied clauses every positive literal occurs in, kept up
+    to date from the trail, with a heap of the free variables by count.
+    Ties go to the lowest rank, by default the first occurrence.
+    """
+
+    def __init__(self, state: TrailCNF, ranks: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = {var: 0 for var in state.variables()}
+        for clause in state.clauses:
             for literal in clause:
-                literals_set.add(abs(literal))
-        self.all_literals = list(literals_set)
+                if literal > 0:
+                    self.counts[literal] += 1
+        if ranks is None:
+            ranks = first_occurrences(state.clauses)
+        self.heap = IndexedHeap(self.counts, self.counts, ranks)
+
+    def clause_added(self, clause: List[int]) -> None:
+        self._add(clause, 1)
+
+    def clause_removed(self, clause: List[int]) -> None:
+        self._add(clause, -1)
+
+    def literal_assigned(self, literal: int) -> None:
+        if abs(literal) in self.heap:
+            self.heap.remove(abs(literal))
+
+    def literal_unassigned(self, literal: int) -> None:
+        if abs(literal) in self.counts:
+            self.heap.push(abs(literal))
+
+    def best_literal(self) -> int:
+        return self.heap.peek()
+
+    def _add(self, clause: List[int], count: int) -> None:
+        for literal in clause:
+            if literal > 0:
+                self.counts[literal] += count
+                if literal in self.heap:
+                    self.heap.update(literal)
+
+
+class DPLLDLIS(DPLL):
+    scans_clauses = True
+
+    def __init__(
+        self,
+        init_cnf: CNFClauseSet,
+        engine: str = "trail",
+        budget: Optional[Budget] = None,
+    ):
+        super(DPLLDLIS, self).__init__(init_cnf, engine, budget)
+        self.all_literals = list(init_cnf.variables())
+        # ties go to the literal occurring first in the input formula, in the
+        # heap and in the scan over the clauses alike
+        self.ranks = first_occurrences(init_cnf.clauses)
+        self.dlis_counts = None
+
+    def attach(self, state: TrailCNF) -> None:
+        # only the in-place trail reports its changes
+        if isinstance(state, TrailCNF):
+            self.dlis_counts = DLISCounts(state, self.ranks)
+            state.listeners.append(self.dlis_counts)
 
     def choose_literal(self, cnf: CNFClauseSet, model: Model) -> int:
         """
         DLIS heuristic, where we count occurrences of each unassigned literal.
         """
+        if self.dlis_counts is not None:
+            return self.dlis_counts.best_literal()
+
         literal_counts = dict()
         # only checking literals that have not been assigned/satisfied
-        available_literals = list_diff(self.all_literals, model.keys())
+        available_literals = set(self.all_literals) - model.keys()
 
         # calculate DLIS scores
         for clause in cnf.clauses:
@@ -30,8 +108,11 @@ class DPLLDLIS(DPLL):
                 if literal in available_literals:
                     # if literal does not exist yet in dictionary, assign count 0 then +1, otherwise just +1
                     literal_counts[literal] = literal_counts.get(literal, 0) + 1
-        # print(literal_counts)
 
-        # select literal with the highest count
-        candidate = max(literal_counts, key=literal_counts.get)
+        # select literal with the highest count, the first occurring on ties
+        ranks = self.ranks
+        candidate = max(
+            literal_counts,
+            key=lambda literal: (literal_counts[literal], -ranks[literal]),
+        )
         return candidate
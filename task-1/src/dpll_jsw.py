@@ -1,32 +1,156 @@
+from typing import Dict, List, Optional
+
+from src.budget import Budget
 from src.cnf import CNFClauseSet
 from src.dpll import DPLL
+from src.heap import IndexedHeap
+from src.trail import ClauseListener, TrailCNF
 from src.utils import Model
 
 
+def jw_weights(clauses: List[List[int]]) -> Dict[int, float]:
+    weights = dict()
+    for clause in clauses:
+        weight = 2.0 ** -len(clause)
+        for literal in clause:
+            weights[literal] = weights.get(literal, 0.0) + weight
+    return weights
+
+
+class JWScores(ClauseListener):
+    """
+    Jeroslow-Wang weights J(l) = sum of 2^-|c| over the clauses c containing
+    the literal l, with a heap of the free variables (two-sided, scored by
+    J(x) + J(-x)) or free literals (one-sided, scored by J(l)).
+
+    With dynamic=True the weights follow the residual formula as the trail
+    satisfies and shortens clauses, and two-sided JW branches first on the
+    polarity of the best variable with the higher J(l). Otherwise they are
+    the weights of the initial formula and the positive literal is tried
+    first.
+    """
+
+    def __init__(self, state: TrailCNF, two_sided: bool = True, dynamic: bool = False):
+        self.two_sided = two_sided
+        self.dynamic = dynamic
+        self.weights = jw_weights(state.clauses)
+        for literal in list(self.weights):
+            self.weights.setdefault(-literal, 0.0)
+
+        if two_sided:
+            self.scores = {
+                var: self.weights[var] + self.weights[-var]
+                for var in self.weights
+                if var > 0
+            }
+        else:
+            self.scores = self.weights
+        self.heap = IndexedHeap(self.scores, self.scores)
+
+    def clause_added(self, clause: List[int]) -> None:
+        if self.dynamic:
+            self._add(clause, 2.0 ** -len(clause))
+
+    def clause_removed(self, clause: List[int]) -> None:
+        if self.dynamic:
+            self._add(clause, -(2.0 ** -len(clause)))
+
+    def literal_assigned(self, literal: int) -> None:
+        for key in self._keys(literal):
+            if key in self.heap:
+                self.heap.remove(key)
+
+    def literal_unassigned(self, literal: int) -> None:
+        for key in self._keys(literal):
+            if key in self.scores:
+                self.heap.push(key)
+
+    def best_literal(self) -> int:
+        key = self.heap.peek()
+        # a two-sided key is a variable
+        if self.two_sided and self.dynamic and self.weights[-key] > self.weights[key]:
+            return -key
+        return key
+
+    def _keys(self, literal: int) -> List[int]:
+        if self.two_sided:
+            return [abs(literal)]
+        return [literal, -literal]
+
+    def _add(self, clause: List[int], weight: float) -> None:
+        for literal in clause:
+            self.weights[literal] += weight
+            key = literal
+            if self.two_sided:
+                key = abs(literal)
+                self.scores[key] += weight
+            if key in self.heap:
+                self.heap.update(key)
+
+
 class DPLLDLJW(DPLL):
-    def __init__(self, init_cnf: CNFClauseSet):
-        super(DPLLDLJW, self).__init__(init_cnf)
-        jw_dict = dict()
+    def __init__(
+        self,
+        init_cnf: CNFClauseSet,
+        engine: str = "trail",
+        two_sided: bool = True,
+        dynamic: bool = False,
+        budget: Optional[Budget] = None,
+    ):
+        """
+        By default the scores of the input formula give a static variable
+        order, which is much faster on sudokus. dynamic=True scores the
+        residual formula at every decision instead.
+        """
+        # set first, the engine check of DPLL reads it
+        self.dynamic = dynamic
+        super(DPLLDLJW, self).__init__(init_cnf, engine, budget)
+        self.two_sided = two_sided
+        self.jw_scores = None
+        self.initial_weights = None
 
-        for clause in init_cnf.clauses:
-            for literal in clause:
-                var = abs(literal)
-                weight = 2 ** -len(clause)
-                jw_dict[var] = jw_dict.get(var, 0) + weight
+    @property
+    def scans_clauses(self) -> bool:
+        # the static weights are computed once from the input formula
+        return self.dynamic
 
-        self.jw_dict = jw_dict
+    def attach(self, state: TrailCNF) -> None:
+        # only the in-place trail reports its changes
+        if isinstance(state, TrailCNF):
+            self.jw_scores = JWScores(state, self.two_sided, self.dynamic)
+            state.listeners.append(self.jw_scores)
 
     def choose_literal(self, cnf: CNFClauseSet, model: Model) -> int:
         """
         Chooses the best literal based on the Jeroslow-Wang heuristic.
         """
-        # calculate the weighted sum for each variable
-        available_vars = {var: weight for var, weight in self.jw_dict.items(
-        ) if var not in model and -var not in model}
+        if self.jw_scores is not None:
+            return self.jw_scores.best_literal()
 
-        if not available_vars:
+        # no incremental scores, weigh the residual or the initial formula
+        if self.dynamic:
+            weights = jw_weights(cnf.clauses)
+        else:
+            if self.initial_weights is None:
+                self.initial_weights = jw_weights(self.cnf.clauses)
+            weights = self.initial_weights
+        weights = {
+            literal: weight
+            for literal, weight in weights.items()
+            if abs(literal) not in model
+        }
+
+        if not weights:
             raise ValueError("No available literals to choose from.")
 
-        # select the variable with the highest weighted sum
-        best_var = max(available_vars, key=available_vars.get)
-        return best_var if best_var not in model else -best_var
+        # select the key with the highest weight, the smallest one on ties
+        if not self.two_sided:
+            return max(weights, key=lambda literal: (weights[literal], -literal))
+
+        var = max(
+            {abs(literal) for literal in weights},
+            key=lambda var: (weights.get(var, 0) + weights.get(-var, 0), -var),
+        )
+        if self.dynamic and weights.get(-var, 0) > weights.get(var, 0):
+            return -var
+        return var
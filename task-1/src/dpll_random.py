@@ -1,18 +1,21 @@
 import random
+from typing import Optional
 
+from src.budget import Budget
 from src.cnf import CNFClauseSet
 from src.dpll import DPLL
 from src.utils import Model, list_diff
 
 
 class DPLLRandom(DPLL):
-    def __init__(self, init_cnf: CNFClauseSet):
-        super(DPLLRandom, self).__init__(init_cnf)
-        literals_set = set()
-        for clause in init_cnf.clauses:
-            for literal in clause:
-                literals_set.add(abs(literal))
-        self.all_literals = list(literals_set)
+    def __init__(
+        self,
+        init_cnf: CNFClauseSet,
+        engine: str = "trail",
+        budget: Optional[Budget] = None,
+    ):
+        super(DPLLRandom, self).__init__(init_cnf, engine, budget)
+        self.all_literals = list(init_cnf.variables())
 
     def choose_literal(self, cnf: CNFClauseSet, model: Model) -> int:
         available_literals = self.all_literals
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, Optional
+
+
+class IndexedHeap:
+    """
+    Binary max-heap of keys ordered by an external score dictionary, ties
+    go to the key with the lower rank, by default the smaller key.
+
+    The position of every key is indexed, so a key whose score changed can
+    be moved to its new place in O(log n) instead of rebuilding the heap.
+    """
+
+    def __init__(
+        self,
+        scores: Dict[int, float],
+        keys: Iterable[int] = (),
+        ranks: Optional[Dict[int, int]] = None,
+    ):
+        self.scores = scores
+        self.ranks = ranks if ranks is not None else {key: key for key in scores}
+        self.heap = []
+        self.index: Dict[int, int] = {}
+        for key in keys:
+            self.push(key)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key: int):
+        return key in self.index
+
+    def peek(self) -> int:
+        return self.heap[0]
+
+    def push(self, key: int):
+        if key in self.index:
+            return
+        self.index[key] = len(self.heap)
+        self.heap.append(key)
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self) -> int:
+        top = self.heap[0]
+        last = self.heap.pop()
+        del self.index[top]
+        if self.heap:
+            self.heap[0] = last
+            self.index[last] = 0
+            self._sift_down(0)
+        return top
+
+    def remove(self, key: int):
+        i = self.index.pop(key)
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.index[last] = i
+            self.update(last)
+
+    def update(self, key: int):
+        """
+        Restores the heap order after the score of the key changed.
+        """
+        if key in self.index:
+            self._sift_down(self._sift_up(self.index[key]))
+
+    def _sift_up(self, i: int) -> int:
+        heap, scores, index, ranks = self.heap, self.scores, self.index, self.ranks
+        key = heap[i]
+        score = scores[key]
+        while i > 0:
+            parent = (i - 1) >> 1
+            other = scores[heap[parent]]
+            if other > score or (other == score and ranks[heap[parent]] < ranks[key]):
+                break
+            heap[i] = heap[parent]
+            index[heap[i]] = i
+            i = parent
+        heap[i] = key
+        index[key] = i
+        return i
+
+    def _sift_down(self, i: int) -> int:
+        heap, scores, index, ranks = self.heap, self.scores, self.index, self.ranks
+        key = heap[i]
+        score = scores[key]
+        size = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size:
+                left, right = scores[heap[child]], scores[heap[child + 1]]
+                if right > left or (
+                    right == left and ranks[heap[child + 1]] < ranks[heap[child]]
+                ):
+                    child += 1
+            other = scores[heap[child]]
+            if other < score or (other == score and ranks[heap[child]] > ranks[key]):
+                break
+            heap[i] = heap[child]
+            index[heap[i]] = i
+            i = child
+        heap[i] = key
+        index[key] = i
+        return i
@@ -0,0 +1,78 @@
+from typing import Callable, Dict, FrozenSet, List, Set
+
+
+class LearnedClauses:
+    """
+    Database of the clauses learned by CDCL.
+
+    The clauses themselves live in the watched clause store, the database
+    keeps the literal block distance (LBD) of every learned clause id and a
+    hash set of their literals, so duplicates are rejected in O(1).
+
+    Every `interval` conflicts, growing by `interval_inc` each time, the
+    worse half of the clauses is selected for deletion: highest LBD first,
+    oldest first among equal LBD. Glue clauses (LBD <= glue) and the reasons
+    of current assignments are always kept.
+    """
+
+    def __init__(self, interval: int = 2000, interval_inc: int = 300, glue: int = 2):
+        self.keys: Set[FrozenSet[int]] = set()
+        # clause id -> LBD, in the order the clauses were learned
+        self.lbd: Dict[int, int] = {}
+        self.key_of: Dict[int, FrozenSet[int]] = {}
+        self.interval = interval
+        self.interval_inc = interval_inc
+        self.next_reduce = interval
+        self.glue = glue
+        self.deleted = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, clause: List[int]):
+        return frozenset(clause) in self.keys
+
+    def add(self, clause: List[int], cid: int = None, lbd: int = None):
+        """
+        Records a learned clause. Unit clauses are not stored as clauses,
+        they have no id and are never deleted.
+        """
+        key = frozenset(clause)
+        self.keys.add(key)
+        if cid is not None:
+            self.lbd[cid] = lbd
+            self.key_of[cid] = key
+
+    def update(self, cid: int, lbd: int):
+        """
+        Lowers the LBD of a learned clause that took part in a conflict
+        under an assignment spanning fewer levels.
+        """
+        if lbd < self.lbd[cid]:
+            self.lbd[cid] = lbd
+
+    def should_reduce(self, conflicts: int) -> bool:
+        if conflicts < self.next_reduce:
+            return False
+        self.interval += self.interval_inc
+        self.next_reduce = conflicts + self.interval
+        return True
+
+    def reduce(self, locked: Callable[[int], bool]) -> List[int]:
+        """
+        Forgets the worse half of the learned clauses and returns their ids,
+        the caller detaches them from the watch lists.
+        """
+        candidates = [
+            cid
+            for cid, lbd in self.lbd.items()
+            if lbd > self.glue and not locked(cid)
+        ]
+        # sorted is stable, so older clauses come first among equal LBD
+        candidates.sort(key=lambda cid: -self.lbd[cid])
+        victims = candidates[: len(self.lbd) // 2]
+        for cid in victims:
+            del self.lbd[cid]
+            self.keys.discard(self.key_of.pop(cid))
+        self.deleted += len(victims)
+        return victims
@@ -0,0 +1,124 @@
+import multiprocessing
+import queue as queues
+import random
+import time
+from functools import partial
+from typing import List, Optional, Tuple
+
+from src.budget import UNKNOWN, Budget
+from src.cdcl import CDCL
+from src.cnf import CNFClauseSet
+from src.dpll_dlis import DPLLDLIS
+from src.dpll_jsw import DPLLDLJW
+from src.dpll_random import DPLLRandom
+from src.utils import Model
+
+SOLVERS = {
+    "random": DPLLRandom,
+    "dlis": DPLLDLIS,
+    # Jeroslow-Wang on the input formula only, and on the residual formula
+    "jsw": DPLLDLJW,
+    "jsw-dynamic": partial(DPLLDLJW, dynamic=True),
+    "cdcl": CDCL,
+}
+
+# seconds between checks for solver processes that died without answering
+POLL_INTERVAL = 0.1
+
+# (solver name, random seed) pairs raced by default
+DEFAULT_PORTFOLIO = [
+    ("cdcl", 0),
+    ("jsw", 0),
+    ("dlis", 0),
+    ("random", 1),
+    ("random", 2),
+]
+
+
+class Portfolio:
+    """
+    Runs several solvers on the same formula, each in its own process, and
+    returns the answer of the first one to finish. The other processes are
+    terminated as soon as an answer is known. Every solver gets its own copy
+    of the budget, the answer is UNKNOWN if all of them exhaust it.
+    """
+
+    def __init__(
+        self,
+        cnf: CNFClauseSet,
+        solvers: List[Tuple[str, int]] = DEFAULT_PORTFOLIO,
+        budget: Optional[Budget] = None,
+    ):
+        for name, _ in solvers:
+            if name not in SOLVERS:
+                raise ValueError(f"Invalid solver: {name}")
+        self.cnf = cnf
+        self.solvers = solvers
+        self.budget = budget
+        # (name, seed) of the solver that answered
+        self.winner = None
+        self.exec_time = 0
+
+    def solve(self) -> Tuple[bool, Model]:
+        start_time = time.perf_counter()
+        queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_run,
+                # the class itself, a spawned process imports its module and
+                # may not know the solvers registered at run time
+                args=(i, SOLVERS[name], seed, self.cnf, self.budget, queue),
+                daemon=True,
+            )
+            for i, (name, seed) in enumerate(self.solvers)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            errors = []
+            answered = set()
+            # processes found dead on the previous check
+            dead = set()
+            while len(answered) < len(processes):
+                try:
+                    i, result, error = queue.get(timeout=POLL_INTERVAL)
+                except queues.Empty:
+                    # a process killed by a signal or os._exit never answers,
+                    # an answer sent right before exiting arrives within one
+                    # more interval
+                    for i in dead - answered:
+                        answered.add(i)
+                        code = processes[i].exitcode
+                        errors.append(f"{self.solvers[i]} exited with code {code}")
+                    dead = {
+                        i
+                        for i, process in enumerate(processes)
+                        if i not in answered and process.exitcode is not None
+                    }
+                    continue
+                answered.add(i)
+                if error is not None:
+                    errors.append(error)
+                elif result[0] is not UNKNOWN:
+                    self.winner = self.solvers[i]
+                    return result
+            if len(errors) == len(processes):
+                raise RuntimeError(f"Every solver failed: {errors}")
+            return UNKNOWN, None
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+            self.exec_time = time.perf_counter() - start_time
+
+
+def _run(
+    i: int, solver, seed: int, cnf: CNFClauseSet, budget: Optional[Budget], queue
+):
+    random.seed(seed)
+    try:
+        queue.put((i, solver(cnf, budget=budget).solve(), None))
+    except Exception as e:
+        queue.put((i, None, repr(e)))
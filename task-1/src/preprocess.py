@@ -0,0 +1,286 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.cnf import CNFClauseSet
+from src.utils import Model
+
+
+class Preprocessor:
+    """
+    Simplifies a formula before search while preserving satisfiability.
+
+    Tautologies and duplicate literals are dropped once, then top level unit
+    propagation, subsumption and self-subsuming resolution, failed literal
+    probing and bounded variable elimination run until nothing changes.
+    Clauses are indexed by occurrence lists, so every step only looks at the
+    clauses sharing a variable with the clause it starts from.
+
+    Eliminated variables are not part of the simplified formula, reconstruct
+    extends a model of the simplified formula to one of the original.
+    """
+
+    def __init__(
+        self,
+        cnf: CNFClauseSet,
+        probe: bool = True,
+        eliminate: bool = True,
+        elimination_limit: int = 400,
+    ):
+        self.cnf = cnf
+        self.probe = probe
+        self.eliminate = eliminate
+        # variables whose resolvents would take more pairs are not eliminated
+        self.elimination_limit = elimination_limit
+        self.clauses: List[Optional[List[int]]] = []
+        self.occurrences: Dict[int, Set[int]] = {}
+        self.variables = cnf.variables()
+        # top level assignments and the units waiting to be assigned
+        self.fixed: Model = {}
+        self.units: List[int] = []
+        self.unsat = False
+        # eliminated variables with the clauses they occurred in, in order
+        self.eliminated: List[Tuple[int, List[List[int]]]] = []
+        # clauses to check for subsuming or strengthening others
+        self.queue: Set[int] = set()
+
+    def simplify(self) -> CNFClauseSet:
+        """
+        Returns the simplified formula. An unsatisfiable formula becomes a
+        single empty clause.
+        """
+        keys = set()
+        for clause in self.cnf.clauses:
+            key = tuple(sorted(set(clause)))
+            if key not in keys:
+                keys.add(key)
+                self.add_clause(list(key))
+
+        changed = True
+        while changed and not self.unsat:
+            changed = self.propagate()
+            changed |= self.subsume()
+            if self.probe and not self.unsat:
+                changed |= self.probe_literals()
+            if self.eliminate and not self.unsat:
+                changed |= self.eliminate_variables()
+
+        if self.unsat:
+            return CNFClauseSet([[]], compact=self.cnf.compact)
+        return CNFClauseSet(
+            [clause for clause in self.clauses if clause is not None],
+            compact=self.cnf.compact,
+        )
+
+    def reconstruct(self, model: Model) -> Model:
+        """
+        Extends a model of the simplified formula to the original variables.
+        """
+        model = {var: False for var in self.variables} | model | self.fixed
+        for var, clauses in reversed(self.eliminated):
+            # the resolvents hold, so the clauses of at most one polarity
+            # can be unsatisfied without the eliminated variable
+            model[var] = False
+            for clause in clauses:
+                if not any(model[abs(lit)] == (lit > 0) for lit in clause):
+                    model[var] = True
+                    break
+        return model
+
+    def add_clause(self, clause: List[int]) -> None:
+        if any(-lit in clause for lit in clause):
+            return
+        literals = []
+        for lit in clause:
+            value = self.fixed.get(abs(lit))
+            if value is None:
+                literals.append(lit)
+            elif value == (lit > 0):
+                return
+        if not literals:
+            self.unsat = True
+            return
+        if len(literals) == 1:
+            self.units.append(literals[0])
+
+        cid = len(self.clauses)
+        self.clauses.append(literals)
+        for lit in literals:
+            self.occurrences.setdefault(lit, set()).add(cid)
+        self.queue.add(cid)
+
+    def remove_clause(self, cid: int) -> None:
+        for lit in self.clauses[cid]:
+            self.occurrences[lit].discard(cid)
+        self.clauses[cid] = None
+        self.queue.discard(cid)
+
+    def strengthen(self, cid: int, lit: int) -> None:
+        """
+        Removes a literal that is false or resolved away from a clause.
+        """
+        clause = self.clauses[cid]
+        clause.remove(lit)
+        self.occurrences[lit].discard(cid)
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        self.queue.add(cid)
+
+    def propagate(self) -> bool:
+        """
+        Assigns the unit clauses at the top level. Returns True if anything
+        was assigned.
+        """
+        changed = False
+        while self.units and not self.unsat:
+            lit = self.units.pop()
+            value = self.fixed.get(abs(lit))
+            if value is not None:
+                if value != (lit > 0):
+                    self.unsat = True
+                continue
+            self.fixed[abs(lit)] = lit > 0
+            changed = True
+            for cid in list(self.occurrences.get(lit, ())):
+                self.remove_clause(cid)
+            for cid in list(self.occurrences.get(-lit, ())):
+                self.strengthen(cid, -lit)
+        return changed
+
+    def subsume(self) -> bool:
+        """
+        Removes the clauses subsumed by a queued clause and strengthens the
+        ones it subsumes after flipping one literal (self-subsuming
+        resolution). Returns True if any clause changed.
+        """
+        changed = False
+        while self.queue and not self.unsat:
+            # shorter clauses subsume more, so they go first
+            batch = sorted(self.queue, key=lambda c: len(self.clauses[c]))
+            self.queue.clear()
+            for cid in batch:
+                clause = self.clauses[cid]
+                if clause is None or self.unsat:
+                    continue
+                changed |= self.subsume_with(cid, clause)
+                self.propagate()
+        return changed
+
+    def subsume_with(self, cid: int, clause: List[int]) -> bool:
+        # every candidate contains the least frequent variable of the clause
+        lit = min(clause, key=self.frequency)
+        candidates = self.occurrences.get(lit, set()) | self.occurrences.get(
+            -lit, set()
+        )
+        changed = False
+        for other in candidates:
+            other_clause = self.clauses[other]
+            if other == cid or other_clause is None:
+                continue
+            if len(other_clause) < len(clause):
+                continue
+            flipped = None
+            for x in clause:
+                if x in other_clause:
+                    continue
+                if flipped is None and -x in other_clause:
+                    flipped = -x
+                    continue
+                break
+            else:
+                if flipped is None:
+                    self.remove_clause(other)
+                else:
+                    self.strengthen(other, flipped)
+                changed = True
+        return changed
+
+    def frequency(self, lit: int) -> int:
+        return len(self.occurrences.get(lit, ())) + len(
+            self.occurrences.get(-lit, ())
+        )
+
+    def probe_literals(self) -> bool:
+        """
+        Assigns every literal whose propagation runs into a conflict the
+        opposite value. Returns True if any literal failed.
+        """
+        changed = False
+        for var in sorted(self.variables):
+            for lit in (var, -var):
+                if self.unsat or var in self.fixed:
+                    break
+                if self.probe_conflict(lit):
+                    self.units.append(-lit)
+                    self.propagate()
+                    changed = True
+        return changed
+
+    def probe_conflict(self, lit: int) -> bool:
+        """
+        Propagates the literal over the current clauses without changing
+        them. Returns True on conflict.
+        """
+        assigned = {lit}
+        queue = [lit]
+        while queue:
+            false_lit = -queue.pop()
+            for cid in self.occurrences.get(false_lit, ()):
+                unassigned = None
+                for other in self.clauses[cid]:
+                    if other in assigned:
+                        break
+                    if -other in assigned:
+                        continue
+                    if unassigned is not None:
+                        break
+                    unassigned = other
+                else:
+                    if unassigned is None:
+                        return True
+                    assigned.add(unassigned)
+                    queue.append(unassigned)
+        return False
+
+    def eliminate_variables(self) -> bool:
+        """
+        Replaces the clauses of a variable by all their non-tautological
+        resolvents on it, whenever that does not increase the number of
+        clauses. Returns True if any variable was eliminated.
+        """
+        changed = False
+        for var in sorted(self.variables, key=self.frequency):
+            if self.unsat:
+                break
+            if var in self.fixed or self.frequency(var) == 0:
+                continue
+            positive = [self.clauses[c] for c in self.occurrences.get(var, ())]
+            negative = [self.clauses[c] for c in self.occurrences.get(-var, ())]
+            if len(positive) * len(negative) > self.elimination_limit:
+                continue
+
+            resolvents = []
+            for left in positive:
+                for right in negative:
+                    resolvent = set(left) | set(right)
+                    resolvent.discard(var)
+                    resolvent.discard(-var)
+                    if any(-x in resolvent for x in resolvent):
+                        continue
+                    resolvents.append(sorted(resolvent))
+                    if len(resolvents) > len(positive) + len(negative):
+                        break
+                if len(resolvents) > len(positive) + len(negative):
+                    break
+            else:
+                self.eliminated.append((var, [list(c) for c in positive + negative]))
+                for cid in list(self.occurrences.get(var, ())):
+                    self.remove_clause(cid)
+                for cid in list(self.occurrences.get(-var, ())):
+                    self.remove_clause(cid)
+                for resolvent in resolvents:
+                    self.add_clause(resolvent)
+                self.propagate()
+                changed = True
+        self.subsume()
+        return changed
@@ -0,0 +1,98 @@
+from collections import deque
+
+
+def luby(i: int) -> int:
+    """
+    Returns the i-th element (from 1) of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    """
+    while True:
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+        if (1 << k) - 1 == i:
+            return 1 << (k - 1)
+        # the sequence repeats itself after every power of two
+        i -= (1 << (k - 1)) - 1
+
+
+class RestartPolicy:
+    """
+    Decides when CDCL abandons its current decisions. `conflict` is told
+    the LBD of every learned clause and returns True to restart now.
+    """
+
+    def conflict(self, lbd: int) -> bool:
+        return False
+
+
+class LubyRestarts(RestartPolicy):
+    """
+    Restarts after base * luby(i) conflicts.
+    """
+
+    def __init__(self, base: int = 100):
+        self.base = base
+        self.count = 0
+        self.i = 1
+
+    def conflict(self, lbd: int) -> bool:
+        self.count += 1
+        if self.count < self.base * luby(self.i):
+            return False
+        self.count = 0
+        self.i += 1
+        return True
+
+
+class GeometricRestarts(RestartPolicy):
+    """
+    Restarts after base conflicts, the limit grows by factor every time.
+    """
+
+    def __init__(self, base: int = 100, factor: float = 1.5):
+        self.limit = base
+        self.factor = factor
+        self.count = 0
+
+    def conflict(self, lbd: int) -> bool:
+        self.count += 1
+        if self.count < self.limit:
+            return False
+        self.count = 0
+        self.limit *= self.factor
+        return True
+
+
+class GlucoseRestarts(RestartPolicy):
+    """
+    Dynamic restarts of Glucose: restarts when the learned clauses of the
+    last window conflicts are worse (higher average LBD) than the average
+    of all learned clauses by more than margin.
+    """
+
+    def __init__(self, window: int = 50, margin: float = 0.8):
+        self.recent = deque(maxlen=window)
+        self.margin = margin
+        self.total = 0
+        self.count = 0
+
+    def conflict(self, lbd: int) -> bool:
+        self.recent.append(lbd)
+        self.total += lbd
+        self.count += 1
+        if len(self.recent) < self.recent.maxlen:
+            return False
+        recent = sum(self.recent) / len(self.recent)
+        if recent * self.margin <= self.total / self.count:
+            return False
+        self.recent.clear()
+        return True
+
+
+RESTARTS = {
+    "none": RestartPolicy,
+    "luby": LubyRestarts,
+    "geometric": GeometricRestarts,
+    "glucose": GlucoseRestarts,
+}
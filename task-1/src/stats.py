@@ -0,0 +1,94 @@
+import time
+import weakref
+from functools import wraps
+from typing import Callable, Dict, List
+
+# search events counted by every solver
+EVENTS = (
+    "decisions",
+    "propagations",
+    "conflicts",
+    "learned",
+    "restarts",
+    "backtracks",
+)
+
+# methods of the solvers and their search states whose time is accounted to
+# every phase, when timing is enabled
+PHASES = {
+    "unit_propagation": ("remove_unit_clauses", "propagate", "unit_propagate"),
+    "pure_literals": ("remove_pure_literals", "assign_pure_literals"),
+    "choose_literal": ("choose_literal", "make_decision"),
+    "conflict_analysis": ("analyze_conflict",),
+}
+
+# names of the values returned by Statistics.as_dict
+COLUMNS = list(EVENTS) + [f"{phase}_time" for phase in PHASES]
+
+
+class Statistics:
+    """
+    Counters of the search events of a solver and, when timing is enabled,
+    the time spent in every phase of the search.
+
+    Hooks are called with the solver after an event is recorded, e.g. to
+    sample its state every thousand conflicts from a profiler. Phase timing
+    wraps the phase methods of the solver and its search state, so it costs
+    nothing unless it is enabled before the solve starts.
+    """
+
+    def __init__(self, timing: bool = False):
+        self.counts: Dict[str, int] = dict.fromkeys(EVENTS, 0)
+        # nanoseconds per phase
+        self.times: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.timing = timing
+        self.hooks: Dict[str, List[Callable]] = {}
+        self.instrumented = weakref.WeakSet()
+
+    def __getitem__(self, event: str) -> int:
+        return self.counts[event]
+
+    def add_hook(self, event: str, hook: Callable) -> None:
+        if event not in self.counts:
+            raise ValueError(f"Invalid event: {event}")
+        self.hooks.setdefault(event, []).append(hook)
+
+    def record(self, event: str, solver, count: int = 1) -> None:
+        self.counts[event] += count
+        for hook in self.hooks.get(event, ()):
+            hook(solver)
+
+    def instrument(self, obj) -> None:
+        """
+        Times the phase methods of a solver or search state, if enabled.
+        """
+        if not self.timing or obj in self.instrumented:
+            return
+        self.instrumented.add(obj)
+        for phase, methods in PHASES.items():
+            for name in methods:
+                method = getattr(obj, name, None)
+                if method is not None:
+                    setattr(obj, name, self._timed(method, phase))
+
+    def _timed(self, method, phase: str):
+        times = self.times
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[phase] += time.perf_counter_ns() - start
+
+        return timed
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Counts and phase times in seconds, keyed by COLUMNS.
+        """
+        values: Dict[str, float] = dict(self.counts)
+        for phase, ns in self.times.items():
+            values[f"{phase}_time"] = ns / 1e9
+        return values
@@ -0,0 +1,157 @@
+import math
+from typing import List, Optional
+
+from src.cnf import CNFClauseSet
+from src.utils import encode_literal, is_blank, parse_value
+
+
+class SudokuGrid:
+    """
+    Candidate values of every cell of an n x n sudoku, n = k^2, as bitmasks
+    (bit v - 1 set if v is still possible).
+
+    Placing a value removes it from the peers of the cell, and cells or
+    units left with a single place for a value (naked and hidden singles)
+    are placed in turn, all without building the rules CNF.
+    """
+
+    def __init__(self, sudoku: str):
+        n = math.isqrt(len(sudoku))
+        k = math.isqrt(n)
+        if n * n != len(sudoku) or k * k != n:
+            raise ValueError(f"Invalid sudoku size: {len(sudoku)} cells")
+        self.n = n
+        self.candidates = [(1 << n) - 1] * (n * n)
+        self.values: List[Optional[int]] = [None] * (n * n)
+        self.units = [[r * n + c for c in range(n)] for r in range(n)]
+        self.units += [[r * n + c for r in range(n)] for c in range(n)]
+        self.units += [
+            [(r + i) * n + c + j for i in range(k) for j in range(k)]
+            for r in range(0, n, k)
+            for c in range(0, n, k)
+        ]
+        self.peers = [set() for _ in range(n * n)]
+        for unit in self.units:
+            for cell in unit:
+                self.peers[cell].update(unit)
+        for cell in range(n * n):
+            self.peers[cell].discard(cell)
+
+        self.queue = [
+            (i, parse_value(c)) for i, c in enumerate(sudoku) if not is_blank(c)
+        ]
+        self.consistent = self.propagate()
+
+    def propagate(self) -> bool:
+        """
+        Places the queued values and every naked or hidden single they lead
+        to. Returns False if the puzzle has no solution.
+        """
+        while self.queue:
+            while self.queue:
+                cell, value = self.queue.pop()
+                if not self.place(cell, value):
+                    return False
+            if not self.hidden_singles():
+                return False
+        return True
+
+    def place(self, cell: int, value: int) -> bool:
+        if self.values[cell] is not None:
+            return self.values[cell] == value
+        bit = 1 << (value - 1)
+        if not self.candidates[cell] & bit:
+            return False
+        self.values[cell] = value
+        self.candidates[cell] = bit
+        for peer in self.peers[cell]:
+            candidates = self.candidates[peer]
+            if not candidates & bit:
+                continue
+            candidates &= ~bit
+            self.candidates[peer] = candidates
+            if candidates == 0:
+                return False
+            if candidates & (candidates - 1) == 0 and self.values[peer] is None:
+                # naked single
+                self.queue.append((peer, candidates.bit_length()))
+        return True
+
+    def hidden_singles(self) -> bool:
+        """
+        Queues every value that fits in a single cell of a unit. Returns
+        False if a value fits nowhere in some unit.
+        """
+        for unit in self.units:
+            for value in range(1, self.n + 1):
+                bit = 1 << (value - 1)
+                places = [cell for cell in unit if self.candidates[cell] & bit]
+                if not places:
+                    return False
+                if len(places) == 1 and self.values[places[0]] is None:
+                    self.queue.append((places[0], value))
+        return True
+
+    def is_solved(self) -> bool:
+        return None not in self.values
+
+    def to_cnf(self, dense: bool = False, extended: bool = True) -> CNFClauseSet:
+        """
+        Encodes the grid with variables for the remaining candidates only.
+        Placed cells become unit clauses, so a model of the CNF still holds
+        the whole solution. The extended encoding adds at-most-one clauses
+        per cell and at-least-one clauses per unit and value, as the rules
+        CNF does. A contradictory grid becomes a single empty clause.
+        """
+        cnf = CNFClauseSet(compact=True)
+        if not self.consistent:
+            cnf.add_clause([])
+            return cnf
+
+        n = self.n
+
+        def literal(cell: int, value: int) -> int:
+            return encode_literal(cell // n + 1, cell % n + 1, value, n, dense)
+
+        def options(cell: int) -> List[int]:
+            mask = self.candidates[cell]
+            return [v for v in range(1, n + 1) if mask & (1 << (v - 1))]
+
+        for cell in range(n * n):
+            if self.values[cell] is not None:
+                cnf.add_clause([literal(cell, self.values[cell])])
+                continue
+            literals = [literal(cell, value) for value in options(cell)]
+            cnf.add_clause(literals)
+            if extended:
+                for i in range(len(literals)):
+                    for j in range(i + 1, len(literals)):
+                        cnf.add_clause([-literals[i], -literals[j]])
+
+        for unit in self.units:
+            placed = {self.values[cell] for cell in unit}
+            for value in range(1, n + 1):
+                if value in placed:
+                    continue
+                bit = 1 << (value - 1)
+                literals = [
+                    literal(cell, value)
+                    for cell in unit
+                    if self.candidates[cell] & bit
+                ]
+                for i in range(len(literals)):
+                    for j in range(i + 1, len(literals)):
+                        cnf.add_clause([-literals[i], -literals[j]])
+                if extended:
+                    cnf.add_clause(literals)
+        return cnf
+
+
+def presolve_sudoku(
+    sudoku: str, dense: bool = False, extended: bool = True
+) -> CNFClauseSet:
+    """
+    Applies the givens, naked and hidden singles to the grid and returns
+    the residual CNF, an alternative to CNFClauseSet.from_sudoku.
+    """
+    return SudokuGrid(sudoku).to_cnf(dense, extended)
@@ -0,0 +1,233 @@
+from typing import Dict, List, Tuple
+
+from src.cnf import CNFClauseSet
+from src.utils import Model
+
+ASSIGN, SATISFY, SHORTEN = 0, 1, 2
+
+
+class ClauseListener:
+    """
+    Receives the changes of a TrailCNF residual formula. Shortening a clause
+    is reported as the removal of the old clause followed by the addition
+    of the new one, so listeners only need these two clause events.
+    """
+
+    def clause_added(self, clause: List[int]) -> None:
+        pass
+
+    def clause_removed(self, clause: List[int]) -> None:
+        pass
+
+    def literal_assigned(self, literal: int) -> None:
+        pass
+
+    def literal_unassigned(self, literal: int) -> None:
+        pass
+
+
+class TrailCNF(CNFClauseSet):
+    """
+    Residual formula reduced in place as literals are assigned.
+
+    `clauses` always holds the unsatisfied clauses with their false literals
+    removed, so heuristics can inspect it like a regular CNFClauseSet. Every
+    change is recorded on an undo log and each decision level remembers the
+    log position it started at, so backtracking never copies clause data.
+    Shortening the clauses of a false literal finds the unit ones, so unit
+    propagation needs no watch lists.
+    """
+
+    def __init__(self, cnf: CNFClauseSet):
+        super(TrailCNF, self).__init__()
+        self.model: Model = {}
+        self.trail: List[int] = []
+        self.levels: List[int] = []
+        self.undo: List[Tuple[int, ...]] = []
+        self.literals: List[List[int]] = []
+        self.ids: List[int] = []
+        self.position: List[int] = []
+        self.occurrences: Dict[int, List[int]] = {}
+        self.units: List[int] = []
+        self.conflict = False
+        self.listeners: List[ClauseListener] = []
+        # number of open clauses containing every unassigned literal, and the
+        # literals that may have become pure since the last pure literal pass.
+        # Shortening only removes assigned literals, so it leaves them alone.
+        self.counts: Dict[int, int] = {}
+        self.pure_candidates: List[int] = []
+
+        for clause in cnf.clauses:
+            self.add_clause(clause)
+        # nothing is assigned yet, so every occurrence is in an open clause
+        for literal, cids in self.occurrences.items():
+            self.counts[literal] = len(cids)
+            self.pure_candidates.append(literal)
+
+    def add_clause(self, clause: List[int]):
+        literals = list(dict.fromkeys(clause))
+        # tautologies are satisfied by every assignment
+        if any(-literal in literals for literal in literals):
+            return
+
+        cid = len(self.literals)
+        self.literals.append(literals)
+        self.position.append(len(self.clauses))
+        self.clauses.append(literals)
+        self.ids.append(cid)
+        for literal in literals:
+            self.occurrences.setdefault(literal, []).append(cid)
+
+        if len(literals) == 0:
+            self.conflict = True
+        elif len(literals) == 1:
+            self.units.append(cid)
+
+    @property
+    def decision_level(self) -> int:
+        return len(self.levels)
+
+    def decide(self, literal: int) -> bool:
+        """
+        Opens a new decision level and assigns the literal on it.
+        """
+        self.levels.append(len(self.undo))
+        return self.assign(literal)
+
+    def assign(self, literal: int) -> bool:
+        """
+        Assigns the literal, removing satisfied clauses and shortening the
+        clauses containing its negation. Returns False on conflict.
+        """
+        self.model[abs(literal)] = literal > 0
+        self.trail.append(literal)
+        self.undo.append((ASSIGN, literal))
+        for listener in self.listeners:
+            listener.literal_assigned(literal)
+
+        for cid in self.occurrences.get(literal, ()):
+            if self.position[cid] >= 0:
+                self._satisfy(cid)
+
+        for cid in self.occurrences.get(-literal, ()):
+            if self.position[cid] < 0:
+                continue
+            clause = self._shorten(cid, -literal)
+            if len(clause) == 1:
+                self.units.append(cid)
+            elif len(clause) == 0:
+                self.conflict = True
+
+        return not self.conflict
+
+    def propagate(self) -> bool:
+        """
+        Assigns unit clauses until none are left. Returns False on conflict.
+        """
+        while self.units and not self.conflict:
+            cid = self.units.pop()
+            clause = self.literals[cid]
+            if self.position[cid] >= 0 and len(clause) == 1:
+                self.assign(clause[0])
+        return not self.conflict
+
+    def assign_pure_literals(self) -> bool:
+        """
+        Assigns every literal whose negation does not occur in the residual
+        formula. Returns True if any literal was assigned.
+
+        A literal can only become pure when the count of its negation drops
+        to zero, so only those candidates are checked instead of the whole
+        formula.
+        """
+        counts = self.counts
+        pure = set()
+        for literal in self.pure_candidates:
+            if (
+                counts.get(literal, 0) > 0
+                and counts.get(-literal, 0) == 0
+                and abs(literal) not in self.model
+            ):
+                pure.add(literal)
+        self.pure_candidates.clear()
+
+        for literal in pure:
+            self.assign(literal)
+        return len(pure) > 0
+
+    def backtrack(self) -> None:
+        """
+        Undoes every change made since the last decision and drops its level.
+        """
+        mark = self.levels.pop()
+        while len(self.undo) > mark:
+            entry = self.undo.pop()
+            if entry[0] == ASSIGN:
+                del self.model[abs(entry[1])]
+                self.trail.pop()
+                for listener in self.listeners:
+                    listener.literal_unassigned(entry[1])
+            elif entry[0] == SATISFY:
+                self._restore(entry[1], entry[2])
+            else:
+                self._extend(entry[1], entry[2], entry[3])
+        self.units.clear()
+        # the search only backtracks to states it had fully simplified, so
+        # they have no pure literals
+        self.pure_candidates.clear()
+        self.conflict = False
+
+    def _satisfy(self, cid: int) -> None:
+        for listener in self.listeners:
+            listener.clause_removed(self.literals[cid])
+        counts = self.counts
+        for literal in self.literals[cid]:
+            counts[literal] -= 1
+            if counts[literal] == 0:
+                self.pure_candidates.append(-literal)
+        # swap the clause with the last active one and pop it
+        pos = self.position[cid]
+        last = self.ids[-1]
+        self.clauses[pos] = self.clauses[-1]
+        self.ids[pos] = last
+        self.position[last] = pos
+        self.clauses.pop()
+        self.ids.pop()
+        self.position[cid] = -1
+        self.undo.append((SATISFY, cid, pos))
+
+    def _restore(self, cid: int, pos: int) -> None:
+        # exact inverse of _satisfy, keeps the original clause order
+        self.clauses.append(self.literals[cid])
+        self.ids.append(cid)
+        self.position[cid] = len(self.ids) - 1
+        moved = self.ids[pos]
+        self.clauses[pos], self.clauses[-1] = self.clauses[-1], self.clauses[pos]
+        self.ids[pos], self.ids[-1] = cid, moved
+        self.position[moved] = len(self.ids) - 1
+        self.position[cid] = pos
+        for literal in self.literals[cid]:
+            self.counts[literal] += 1
+        for listener in self.listeners:
+            listener.clause_added(self.literals[cid])
+
+    def _shorten(self, cid: int, literal: int) -> List[int]:
+        clause = self.literals[cid]
+        for listener in self.listeners:
+            listener.clause_removed(clause)
+        i = clause.index(literal)
+        clause[i] = clause[-1]
+        clause.pop()
+        self.undo.append((SHORTEN, cid, literal, i))
+        for listener in self.listeners:
+            listener.clause_added(clause)
+        return clause
+
+    def _extend(self, cid: int, literal: int, i: int) -> None:
+        clause = self.literals[cid]
+        for listener in self.listeners:
+            listener.clause_removed(clause)
+        clause.append(literal)
+        clause[i], clause[-1] = clause[-1], clause[i]
+        for listener in self.listeners:
+            listener.clause_added(clause)
@@ -4,36 +4,65 @@ from typing import Tuple, TypeAlias, Dict, List
 Model: TypeAlias = Dict[int, bool]
 
 
-def print_sudoku(model: Model, size: int):
+def print_sudoku(model: Model, size: int, dense: bool = False):
     table = [["."] * size for _ in range(size)]
     for literal, value in model.items():
         if value:
-            row, column, value = decode_literal(literal, size)
-            table[row - 1][column - 1] = str(value)
+            row, column, value = decode_literal(literal, size, dense)
+            table[row - 1][column - 1] = format_value(value)
     for row in table:
         print("".join(row))
 
 
-def encode_literal(row: int, column: int, value: int, size: int) -> int:
-    if size == 16:
-        return value + 17 * (column + 17 * row)
-    else:
-        return value + 10 * (column + 10 * row)
+def format_value(value: int) -> str:
+    # digits up to 9, then letters as in the 16x16 puzzles (A = 10, G = 16)
+    return "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"[value]
 
 
-def decode_literal(literal: int, size: int) -> Tuple[int, int, int]:
-    if size == 16:
-        value = literal % 17
-        literal = literal // 17
-        column = literal % 17
-        row = literal // 17
-        return row, column, value
-    else:
-        value = literal % 10
-        literal = literal // 10
-        column = literal % 10
-        row = literal // 10
+def parse_value(char: str) -> int:
+    return int(char, 36)
+
+
+def is_blank(char: str) -> bool:
+    # empty cells are written as "." or "0", no value is 0
+    return char in ".0"
+
+
+def literal_base(size: int) -> int:
+    # smallest power of ten above 9 for the original rule files, size + 1 above
+    return 10 if size < 10 else size + 1
+
+
+def encode_literal(
+    row: int, column: int, value: int, size: int, dense: bool = False
+) -> int:
+    """
+    Sparse literals concatenate row, column and value digits in base 10
+    (base size + 1 from 10x10 on), as in data/sudoku-rules-NxN.txt.
+    Dense literals number the cells row by row from 1 to size^3.
+    """
+    if dense:
+        return ((row - 1) * size + column - 1) * size + value
+    base = literal_base(size)
+    return value + base * (column + base * row)
+
+
+def decode_literal(
+    literal: int, size: int, dense: bool = False
+) -> Tuple[int, int, int]:
+    if dense:
+        literal -= 1
+        value = literal % size + 1
+        literal = literal // size
+        column = literal % size + 1
+        row = literal // size + 1
         return row, column, value
+    base = literal_base(size)
+    value = literal % base
+    literal = literal // base
+    column = literal % base
+    row = literal // base
+    return row, column, value
 
 
 def list_diff(left: List, right: List) -> List:
@@ -0,0 +1,104 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils import Model
+
+
+class WatchedClauses:
+    """
+    Clause store with two watched literals per clause.
+
+    Only the first two literals of every clause with at least two literals
+    are watched. Assigning a literal visits just the clauses watching its
+    negation, which either move the watch to another non-false literal or
+    become unit (or conflicting).
+
+    This is the propagation of CDCL only. The DPLL engines keep the residual
+    formula their heuristics read, so an assignment visits every clause of
+    its negation anyway and finds the unit ones on the way; watches on top
+    of that made the trail engine up to half again slower on hard-9x9.
+    """
+
+    def __init__(self):
+        self.clauses: List[List[int]] = []
+        self.watches: Dict[int, List[int]] = {}
+        # ids of removed clauses, reused by the next added clauses
+        self.free: List[int] = []
+
+    def __len__(self):
+        return len(self.clauses) - len(self.free)
+
+    def add_clause(self, clause: List[int]) -> int:
+        """
+        Stores the clause and watches its first two literals. Callers order
+        the clause so that those are non-false, or the most recently
+        assigned ones if every literal is false.
+        """
+        if self.free:
+            cid = self.free.pop()
+            self.clauses[cid] = clause
+        else:
+            cid = len(self.clauses)
+            self.clauses.append(clause)
+        for literal in clause[:2]:
+            self.watches.setdefault(literal, []).append(cid)
+        return cid
+
+    def remove_clause(self, cid: int):
+        """
+        Stops watching the clause and frees its id. The clause must not be
+        the reason of an assigned literal.
+        """
+        for literal in self.clauses[cid][:2]:
+            self.watches[literal].remove(cid)
+        self.clauses[cid] = None
+        self.free.append(cid)
+
+    def propagate(
+        self,
+        model: Model,
+        trail: List[int],
+        head: int,
+        enqueue: Callable[[int, int], None],
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Processes the trail from `head`, calling enqueue(literal, clause id)
+        for every implied literal. Returns the new head and the id of a
+        conflicting clause, or None if there is no conflict.
+        """
+        while head < len(trail):
+            false_literal = -trail[head]
+            head += 1
+            watchers = self.watches.get(false_literal)
+            if not watchers:
+                continue
+
+            i = 0
+            while i < len(watchers):
+                cid = watchers[i]
+                clause = self.clauses[cid]
+                # keep the false watch in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                other = clause[0]
+                value = model.get(abs(other))
+                if value is not None and value == (other > 0):
+                    i += 1
+                    continue
+
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    value = model.get(abs(literal))
+                    if value is None or value == (literal > 0):
+                        clause[1], clause[k] = literal, false_literal
+                        self.watches.setdefault(literal, []).append(cid)
+                        watchers[i] = watchers[-1]
+                        watchers.pop()
+                        break
+                else:
+                    if abs(other) in model:
+                        return head, cid
+                    enqueue(other, cid)
+                    i += 1
+
+        return head, None
+
@@ -1,5 +1,7 @@
+from src.budget import UNKNOWN, Budget
 from src.cdcl import CDCL
 from src.cnf import CNFClauseSet
+from src.restarts import RESTARTS, LubyRestarts, luby
 
 
 def test_unit_propagate():
@@ -19,27 +21,52 @@ def test_unit_propagate():
     assert -2 in cdcl.assignment  # literal -2 should be propagated
 
 
+def test_unit_propagate_watched():
+    """
+    Tests propagation after a decision follows the watch lists
+    and reports a falsified clause as a conflict.
+    """
+    formula = [[-1, 2], [-2, 3], [-3, -1, 4], [-4, -2]]
+    cnf = CNFClauseSet(formula)
+    cdcl = CDCL(cnf)
+    assert cdcl.unit_propagate() is None
+    assert cdcl.assignment == []
+
+    cdcl.assign(1)
+    conflict_clause = cdcl.unit_propagate()
+
+    assert cdcl.assignment[:2] == [1, 2]
+    assert sorted(cdcl.assignment) == [-4, 1, 2, 3]
+    assert sorted(conflict_clause) == [-3, -1, 4]
+
+
 def test_analyze_conflict():
     """
-    Tests conflict analysis generates a correct learned clause.
+    Tests conflict analysis learns the first-UIP clause, drops literals
+    implied by the rest of the clause and backjumps to the second level.
     """
-    formula = [[1, -3], [2, -1], [-2, 3], [-1, -3]]
+    formula = [[-6, 7], [-1, 2], [-2, 3], [-3, -7, 4], [-3, -6, 5], [-4, -5]]
     cnf = CNFClauseSet(formula)
     cdcl = CDCL(cnf)
 
-    # simulate assignments leading to a conflict
-    cdcl.assignment = [1, -3, -2]
-    conflict_clause = [-1, -3]
+    # level 1: 6 implies 7, level 2: 1 implies 2, 3, 4, 5 and a conflict
+    cdcl.decide(6)
+    assert cdcl.unit_propagate() is None
+    cdcl.decide(1)
+    conflict_clause = cdcl.unit_propagate()
+    assert sorted(conflict_clause) == [-5, -4]
 
-    # analyze the conflict
-    learned_clause = cdcl.analyze_conflict(conflict_clause)
+    learned_clause, level = cdcl.analyze_conflict(conflict_clause)
 
-    assert learned_clause == [-3, -1]  # simplified conflict resolution
+    # -7 is implied by -6, 3 is the unique implication point
+    assert learned_clause == [-3, -6]
+    assert level == 1
 
 
 def test_learn_clause():
     """
-    Test learned clauses are added to the CNF and tracked.
+    Test learned clauses are tracked without changing the input formula
+    and duplicates are ignored.
     """
     formula = [[1, 2], [-1, 3], [-3, -2]]
     cnf = CNFClauseSet(formula)
@@ -49,30 +76,40 @@ def test_learn_clause():
     learned_clause = [-2, -1]
     cdcl.learn_clause(learned_clause)
 
-    assert learned_clause in cnf.clauses  # clause added to CNF
+    assert learned_clause not in cnf.clauses  # input formula unchanged
     # Clause tracked in learned_clauses
     assert learned_clause in cdcl.learned_clauses
+    assert [-1, -2] in cdcl.learned_clauses
+
+    cdcl.learn_clause([-1, -2])
+    assert len(cdcl.pending) == len(formula) + 1
+    assert cdcl.unit_propagate() is None
+    assert len(cdcl.watched) == len(formula) + 1
 
 
 def test_backtrack_to_level():
     """
-    Tests backtracking removes assignments above the target decision level.
+    Tests backtracking removes assignments above the target decision level
+    and the learned clause asserts its first literal afterwards.
     """
-    formula = [[1, 2], [-1, 3], [-3, -2]]
+    formula = [[-6, 7], [-1, 2], [-2, 3], [-3, -7, 4], [-3, -6, 5], [-4, -5]]
     cnf = CNFClauseSet(formula)
     cdcl = CDCL(cnf)
-
-    # simulate decisions and assignments
-    cdcl.assignment = [1, -2, 3]
-    cdcl.decision_stack = [(1, 1), (-2, 2), (3, 3)]
-    cdcl.decision_level = 3
+    cdcl.decide(6)
+    cdcl.unit_propagate()
+    cdcl.decide(1)
+    learned_clause, level = cdcl.analyze_conflict(cdcl.unit_propagate())
 
     # perform backtracking
-    learned_clause = [-2, 1]
-    cdcl.backtrack_to_level(learned_clause)
+    cdcl.backtrack_to_level(level)
 
-    assert cdcl.decision_level == 2  # backtracked to level 2
-    assert cdcl.assignment == [1, -2]  # only assignments up to level 2 remain
+    assert cdcl.decision_level == 1  # backtracked to level 1
+    assert cdcl.assignment == [6, 7]  # only assignments up to level 1 remain
+
+    cdcl.learn_clause(learned_clause)
+    assert cdcl.unit_propagate() is None
+    assert cdcl.assignment[2] == -3  # asserted by the learned clause
+    assert cdcl.levels[3] == 1
 
 
 def test_make_decision():
@@ -85,7 +122,7 @@ def test_make_decision():
     cdcl = CDCL(cnf)
 
     # simulate initial assignment
-    cdcl.assignment = [1]
+    cdcl.assign(1)
 
     # make a decision
     cdcl.make_decision()
@@ -94,6 +131,33 @@ def test_make_decision():
     assert len(cdcl.assignment) == 2  # one new decision added
 
 
+def test_make_decision_vsids():
+    """
+    Tests decisions follow the activity bumped by conflict analysis
+    and reuse the saved phase of a variable after backtracking.
+    """
+    formula = [[-6, 7], [-1, 2], [-2, 3], [-3, -7, 4], [-3, -6, 5], [-4, -5]]
+    cnf = CNFClauseSet(formula)
+    cdcl = CDCL(cnf)
+    cdcl.decide(6)
+    cdcl.unit_propagate()
+    cdcl.decide(1)
+    learned_clause, level = cdcl.analyze_conflict(cdcl.unit_propagate())
+
+    # only variables taking part in the conflict were bumped
+    assert cdcl.activity[1] == 0.0
+    assert cdcl.activity[4] > 0.0
+    assert cdcl.phases == {}
+
+    cdcl.backtrack_to_level(0)
+    assert cdcl.phases[6] is True
+    assert cdcl.phases[4] is True
+
+    # a bumped variable is decided next, with its old value
+    cdcl.make_decision()
+    assert cdcl.assignment[-1] in [3, 4, 5, 6, 7]
+
+
 def test_all_variables_assigned():
     """
     Tests detection of whether all variables are assigned.
@@ -102,23 +166,104 @@ def test_all_variables_assigned():
     cnf = CNFClauseSet(formula)
     cdcl = CDCL(cnf)
 
+    # partial assignment
+    cdcl.assign(1)
+    cdcl.assign(-2)
+    assert cdcl.all_variables_assigned() is False  # some variables remain unassigned
+
     # full assignment
-    cdcl.assignment = [1, -2, 3]
+    cdcl.assign(3)
     assert cdcl.all_variables_assigned() is True  # all variables assigned
 
-    # partial assignment
-    cdcl.assignment = [1, -2]
-    assert cdcl.all_variables_assigned() is False  # some variables remain unassigned
+
+def test_solve():
+    """
+    Tests the solver finds a model of a satisfiable formula
+    and proves an unsatisfiable one.
+    """
+    formula = [[1, 2], [-1, 2], [1, -2], [-2, 3, 4], [-3, -4]]
+    result = CDCL(CNFClauseSet(formula)).solve()
+    assert result[0] is True
+    assert all(any(result[1][abs(lit)] == (lit > 0) for lit in c) for c in formula)
+
+    formula = [[1, 2], [-1, 2], [1, -2], [-1, -2]]
+    cdcl = CDCL(CNFClauseSet(formula))
+    assert cdcl.exec_time == 0
+    result = cdcl.solve()
+    assert result[0] is False
+    assert cdcl.exec_time > 0
+
+
+def test_restarts():
+    """
+    Tests the Luby sequence and that the solver stays complete when it
+    restarts after every conflict.
+    """
+    sequence = [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+    assert [luby(i) for i in range(1, 16)] == sequence
+
+    # 5 pigeons do not fit into 4 holes, variable 4 * p + h puts p into h
+    formula = [[4 * p + h for h in range(1, 5)] for p in range(5)]
+    for h in range(1, 5):
+        for p in range(5):
+            for q in range(p + 1, 5):
+                formula.append([-(4 * p + h), -(4 * q + h)])
+
+    for restart in RESTARTS:
+        assert CDCL(CNFClauseSet(formula), restart=restart).solve()[0] is False
+
+    cdcl = CDCL(CNFClauseSet(formula))
+    cdcl.restart_policy = LubyRestarts(base=1)
+    assert cdcl.solve()[0] is False
+    assert cdcl.restarts > 0
+
+    cdcl = CDCL(CNFClauseSet(formula[1:]))
+    cdcl.restart_policy = LubyRestarts(base=1)
+    result = cdcl.solve()
+    assert result[0] is True
+    assert all(any(result[1][abs(lit)] == (lit > 0) for lit in c) for c in formula[1:])
+
+
+def test_budget():
+    """
+    Tests that CDCL stops with UNKNOWN once its conflict or time budget is
+    exhausted, keeping the statistics gathered so far.
+    """
+    # 6 pigeons do not fit into 5 holes
+    formula = [[5 * p + h for h in range(1, 6)] for p in range(6)]
+    for h in range(1, 6):
+        for p in range(6):
+            for q in range(p + 1, 6):
+                formula.append([-(5 * p + h), -(5 * q + h)])
+
+    cdcl = CDCL(CNFClauseSet(formula), budget=Budget(conflicts=10))
+    assert cdcl.solve() == (UNKNOWN, None)
+    assert cdcl.conflicts == 10
+    assert cdcl.budget.exceeded == "conflicts"
+    assert cdcl.stats["learned"] == 10
+    assert cdcl.stats["decisions"] >= cdcl.stats["backtracks"] > 0
+
+    cdcl = CDCL(CNFClauseSet(formula), budget=Budget(time=0))
+    assert cdcl.solve() == (UNKNOWN, None)
+    assert cdcl.budget.exceeded == "time"
+
+    cdcl = CDCL(CNFClauseSet(formula), budget=Budget(conflicts=10**6))
+    assert cdcl.solve()[0] is False
 
 
 def main():
     tests = [
         test_unit_propagate,
+        test_unit_propagate_watched,
         test_analyze_conflict,
         test_learn_clause,
         test_backtrack_to_level,
         test_make_decision,
+        test_make_decision_vsids,
         test_all_variables_assigned,
+        test_solve,
+        test_restarts,
+        test_budget,
     ]
     for test in tests:
         test()
@@ -0,0 +1,228 @@
+import gzip
+import lzma
+import os
+import tempfile
+
+from src.cdcl import CDCL
+from src.cnf import (
+    CNFClauseSet,
+    _rules_cache,
+    generate_sudoku_rules,
+    load_sudoku_rules,
+    rules_path,
+)
+from src.dimacs import read_dimacs
+from src.dpll_random import DPLLRandom
+from src.preprocess import Preprocessor
+from src.sudoku import SudokuGrid, presolve_sudoku
+from src.utils import decode_literal
+
+
+def test_compact_clauses():
+    formula = [[1, -2, 3], [2], [-1, -3]]
+    cnf = CNFClauseSet(formula, compact=True)
+    assert len(cnf) == 3
+    assert list(cnf.clauses) == formula
+    assert cnf.clauses[1] == [2]
+    assert cnf.clauses[-1] == [-1, -3]
+    assert [2] in cnf.clauses
+
+    cnf.add_clause([4, 5])
+    assert len(cnf) == 4
+    assert cnf.clauses[3] == [4, 5]
+    assert cnf.variables() == {1, 2, 3, 4, 5}
+
+
+def test_compact_remove_literal():
+    cnf = CNFClauseSet([[1, -2, 3], [2], [-1, -3]], compact=True)
+    cnf.remove_literal(2)
+    assert list(cnf.clauses) == [[1, 3], [], [-1, -3]]
+
+
+def test_compact_solve():
+    formula = [[1, 2, 3, 4, 5], [1], [-2], [3], [4, -5]]
+    for engine in ["trail", "bitset", "copy"]:
+        cnf = CNFClauseSet(formula, compact=True)
+        result = DPLLRandom(cnf, engine=engine).solve()
+        assert result[0] == True
+        assert len(cnf) == 5
+
+
+def test_shared_base():
+    base = CNFClauseSet([[1, 2], [-1, -2]], compact=True)
+    base.freeze()
+    cnf = CNFClauseSet(base=base)
+    cnf.add_clause([1])
+    assert len(cnf) == 3
+    assert list(cnf.clauses) == [[1, 2], [-1, -2], [1]]
+    assert cnf.clauses[2] == [1]
+    assert len(base) == 2
+
+    try:
+        base.add_clause([3])
+        assert False
+    except ValueError:
+        pass
+
+
+def test_from_sudoku_template():
+    sudoku = "3....21..34....1"
+    cnf = CNFClauseSet.from_sudoku(sudoku)
+    other = CNFClauseSet.from_sudoku(sudoku)
+    rules = load_sudoku_rules(4)
+    # the rules are parsed once and shared, only the givens are stored
+    assert cnf.base is rules and other.base is rules
+    assert len(cnf) == len(rules) + 6
+    assert list(cnf.clauses) == list(CNFClauseSet.from_sudoku(sudoku, False).clauses)
+
+
+def test_persisted_rules():
+    path = rules_path(4)
+    clauses = list(load_sudoku_rules(4).clauses)
+    try:
+        for _ in range(2):
+            # written by the first load, read back by the second
+            del _rules_cache[path]
+            assert list(load_sudoku_rules(4, persist=True).clauses) == clauses
+        # the pickle is written to a temporary file and moved into place
+        assert not [name for name in os.listdir("data") if name.startswith("tmp")]
+    finally:
+        os.remove(os.path.splitext(path)[0] + ".pickle")
+
+
+def test_generated_rules():
+    for n in [4, 9]:
+        generated = sorted(map(sorted, generate_sudoku_rules(n).clauses))
+        parsed = sorted(map(sorted, load_sudoku_rules(n).clauses))
+        assert generated == parsed
+
+    try:
+        generate_sudoku_rules(5)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_dense_sudoku():
+    sudoku = "3....21..34....1"
+    for extended in [True, False]:
+        cnf = CNFClauseSet.from_sudoku(sudoku, dense=True, extended=extended)
+        assert cnf.variables() == set(range(1, 4**3 + 1))
+        sat, model = CDCL(cnf).solve()
+        assert sat
+        grid = [["."] * 4 for _ in range(4)]
+        for literal, value in model.items():
+            if value:
+                row, col, val = decode_literal(literal, 4, dense=True)
+                grid[row - 1][col - 1] = str(val)
+        assert "".join(map("".join, grid)) == "3124421313422431"
+
+
+def test_read_dimacs():
+    text = (
+        "c comment\n"
+        "p cnf 5 4\n"
+        "1  -3 0\n"
+        "c clause spanning lines\n"
+        "2 3\n"
+        " -1 0 4\t5 0\n"
+        "-5 0 \n"
+    )
+    formula = [[1, -3], [2, 3, -1], [4, 5], [-5]]
+    with tempfile.TemporaryDirectory() as tmp:
+        openers = [("f.cnf", open), ("f.cnf.gz", gzip.open), ("f.cnf.xz", lzma.open)]
+        for name, opener in openers:
+            path = os.path.join(tmp, name)
+            with opener(path, "wt") as f:
+                f.write(text)
+            for chunk_size in [3, 1 << 20]:
+                cnf = read_dimacs(path, chunk_size)
+                assert list(cnf.clauses) == formula
+
+    cnf = read_dimacs("test.cnf")
+    assert list(cnf.clauses) == [[1, -3], [2, 3, -1]]
+
+
+def test_preprocess_subsumption():
+    formula = [[1, 2, 3], [1, 2], [2, 1], [-1, 2, 4], [3, -3], [5, 6], [-5, -6]]
+    preprocessor = Preprocessor(CNFClauseSet(formula), probe=False, eliminate=False)
+    cnf = preprocessor.simplify()
+    # [1, 2] subsumes [1, 2, 3] and strengthens [-1, 2, 4] to [2, 4]
+    assert sorted(map(sorted, cnf.clauses)) == [[-6, -5], [1, 2], [2, 4], [5, 6]]
+
+
+def test_preprocess_reconstruct():
+    # -1 fails: it implies 2 and 3, which conflict
+    formula = [[1, 2], [1, 3], [-2, -3, 4], [-4, -2], [5, 6, 7], [-5, 8], [-6, 8]]
+    preprocessor = Preprocessor(CNFClauseSet(formula))
+    cnf = preprocessor.simplify()
+    assert preprocessor.fixed[1] is True
+    assert len(cnf) < len(formula)
+
+    model = preprocessor.reconstruct(CDCL(cnf).solve()[1])
+    assert all(any(model[abs(lit)] == (lit > 0) for lit in c) for c in formula)
+
+    cnf = Preprocessor(CNFClauseSet([[1, 2], [-1, 2], [1, -2], [-1, -2]])).simplify()
+    assert list(cnf.clauses) == [[]]
+    assert CDCL(cnf).solve()[0] is False
+
+
+def test_preprocess_sudoku():
+    with open("data/hard-9x9.txt") as f:
+        sudoku = f.readline().strip()
+    cnf = CNFClauseSet.from_sudoku(sudoku)
+    simplified = Preprocessor(cnf, probe=False).simplify()
+    assert len(simplified) < len(cnf) // 5
+
+
+def test_sudoku_presolve():
+    # singles alone solve this one, the CNF only holds the placed values
+    grid = SudokuGrid("3....21..34....1")
+    assert grid.is_solved()
+    assert grid.values == [3, 1, 2, 4, 4, 2, 1, 3, 1, 3, 4, 2, 2, 4, 3, 1]
+    assert len(grid.to_cnf()) == 16
+
+    with open("data/hard-9x9.txt") as f:
+        sudoku = f.readline().strip()
+    cnf = presolve_sudoku(sudoku)
+    assert len(cnf) < len(CNFClauseSet.from_sudoku(sudoku)) // 5
+    sat, model = CDCL(cnf).solve()
+    assert sat
+    full = CDCL(CNFClauseSet.from_sudoku(sudoku)).solve()[1]
+    assert {lit for lit in model if model[lit]} == {lit for lit in full if full[lit]}
+
+    # two 1s in the first row
+    cnf = presolve_sudoku("11" + "." * 14)
+    assert list(cnf.clauses) == [[]]
+
+    # 0 is an empty cell too
+    sudoku = "3....21..34....1"
+    zeros = sudoku.replace(".", "0")
+    assert SudokuGrid(zeros).values == SudokuGrid(sudoku).values
+    assert list(CNFClauseSet.from_sudoku(zeros).clauses) == list(
+        CNFClauseSet.from_sudoku(sudoku).clauses
+    )
+
+
+def main():
+    tests = [
+        test_compact_clauses,
+        test_compact_remove_literal,
+        test_compact_solve,
+        test_shared_base,
+        test_from_sudoku_template,
+        test_persisted_rules,
+        test_generated_rules,
+        test_dense_sudoku,
+        test_read_dimacs,
+        test_preprocess_subsumption,
+        test_preprocess_reconstruct,
+        test_preprocess_sudoku,
+        test_sudoku_presolve,
+    ]
+    for test in tests:
+        test()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
+from functools import partial
+
 from src.dpll_random import DPLLRandom
+from src.dpll import ENGINES
+from src.dpll_dlis import DLISCounts, DPLLDLIS
+from src.dpll_jsw import DPLLDLJW, JWScores, jw_weights
 from src.cnf import CNFClauseSet
+from src.portfolio import SOLVERS, Portfolio
+from src.batch import BatchPropagator, SAT, UNSAT, solve_sudokus
+from src.trail import TrailCNF
+from src.bitset import BitsetCNF
+from src.budget import UNKNOWN, Budget, memory_usage
+from src.benchmark import benchmark_dataset, regressions, summarize
+from solver_fixtures import CrashingSolver
 
 
 def test_remove_unit_clauses():
@@ -80,6 +92,304 @@ def test_backtrack_invalid():
     assert result[0] == False
 
 
+def test_trail_backtrack_restores():
+    formula = [[1, 2, 3], [-1, 2], [-2, 3], [4, -3]]
+    state = TrailCNF(CNFClauseSet(formula))
+    state.decide(1)
+    state.propagate()
+    # 1, 2, 3 and 4 are forced, every clause is satisfied
+    assert len(state) == 0
+    assert len(state.model) == 4
+    state.backtrack()
+    assert state.clauses == formula
+    assert state.model == {}
+
+
+def test_trail_pure_literals():
+    formula = [[1, 2], [-1, 3], [-2, -3], [2, 4], [-4, 5]]
+    state = TrailCNF(CNFClauseSet(formula))
+    # 5 is pure from the start, 4 once [-4, 5] is satisfied
+    assert state.assign_pure_literals()
+    assert state.model == {5: True}
+    assert state.assign_pure_literals()
+    assert state.model == {5: True, 4: True}
+    assert not state.assign_pure_literals()
+
+    # satisfying [1, 2] leaves 1 only negative
+    state.decide(2)
+    assert state.assign_pure_literals()
+    assert state.model == {5: True, 4: True, 2: True, 1: False}
+    state.backtrack()
+    assert state.counts[1] == 1 and state.counts[-1] == 1
+    assert not state.assign_pure_literals()
+
+
+def test_backtrack_trail1():
+    formula = [[1, 2, 3, 4, 5], [1], [-2], [3], [4, -5]]
+    dpll = DPLLRandom(CNFClauseSet(formula))
+    result = dpll.solve()
+    assert result[0] == True
+    assert len(result[1]) == 5
+
+
+def test_backtrack_trail_invalid():
+    formula = [[2, 3, 5], [1], [-2], [-3], [-5]]
+    dpll = DPLLRandom(CNFClauseSet(formula))
+    result = dpll.solve()
+    assert result[0] == False
+    # the input formula is left untouched
+    assert len(dpll.cnf) == 5
+
+
+def test_backtrack_bitset():
+    state = BitsetCNF(CNFClauseSet([[1, 2, 3], [-1, 2], [-2, -3], [3, 4]]))
+    assert state.decide(1) and state.propagate()
+    assert state.model == {1: True, 2: True, 3: False, 4: True}
+    assert len(state) == 0
+    state.backtrack()
+    assert state.model == {} and state.true == state.false == 0
+    assert sorted(map(sorted, state.clauses)) == [[-3, -2], [-1, 2], [1, 2, 3], [3, 4]]
+
+    # 2 and 4 only occur positively once 3 is false
+    state.decide(-3)
+    assert state.assign_pure_literals()
+    assert state.model == {3: False, 2: True, 4: True}
+
+    formula = [[2, 3, 5], [1], [-2], [-3], [-5]]
+    dpll = DPLLRandom(CNFClauseSet(formula), engine="bitset")
+    assert dpll.solve()[0] == False
+
+    # DLIS and dynamic JW would rebuild the residual formula at every decision
+    for solver in [DPLLDLIS, partial(DPLLDLJW, dynamic=True)]:
+        try:
+            solver(CNFClauseSet(formula), engine="bitset")
+            assert False
+        except ValueError:
+            pass
+    dpll = DPLLDLJW(CNFClauseSet(formula), engine="bitset")
+    assert dpll.solve()[0] == False
+
+
+def test_jw_scores_incremental():
+    formula = [[1, 2, 3], [-1, 2], [-2, -3], [1, 3, 4]]
+    state = TrailCNF(CNFClauseSet(formula))
+    scores = JWScores(state, two_sided=False, dynamic=True)
+    state.listeners.append(scores)
+
+    state.decide(-1)
+    # [1, 2, 3] became [2, 3] and [1, 3, 4] became [3, 4]
+    expected = jw_weights(state.clauses)
+    for literal, weight in scores.weights.items():
+        assert weight == expected.get(literal, 0.0)
+    assert scores.best_literal() == 3
+
+    state.backtrack()
+    assert scores.weights == jw_weights(formula) | {-4: 0.0}
+    assert scores.best_literal() == 2
+
+    # J(1) + J(-1) is the highest, and J(-1) > J(1)
+    formula = [[-1, 2], [-1, 3], [1, 2, 3]]
+    scores = JWScores(TrailCNF(CNFClauseSet(formula)), dynamic=True)
+    assert scores.best_literal() == -1
+    scores = JWScores(TrailCNF(CNFClauseSet(formula)))
+    assert scores.best_literal() == 1
+    dpll = DPLLDLJW(CNFClauseSet(formula), engine="copy", dynamic=True)
+    assert dpll.choose_literal(dpll.cnf, {}) == -1
+
+
+def test_dlis_counts_incremental():
+    formula = [[1, 2, 3], [-1, 2], [-2, 3], [1, 3, 4]]
+    state = TrailCNF(CNFClauseSet(formula))
+    counts = DLISCounts(state)
+    state.listeners.append(counts)
+    assert counts.counts == {1: 2, 2: 2, 3: 3, 4: 1}
+    assert counts.best_literal() == 3
+
+    state.decide(3)
+    # only [-1, 2] is left unsatisfied
+    assert counts.counts == {1: 0, 2: 1, 3: 0, 4: 0}
+    assert counts.best_literal() == 2
+
+    state.backtrack()
+    assert counts.counts == {1: 2, 2: 2, 3: 3, 4: 1}
+    assert counts.best_literal() == 3
+
+
+def test_dlis_ties():
+    # 1 and 2 both occur once positively, 2 first
+    engines = [engine for engine in ENGINES if engine != "bitset"]
+    for engine in engines:
+        dpll = DPLLDLIS(CNFClauseSet([[2, 1], [-2, -1]]), engine=engine)
+        assert first_decisions(dpll, 1) == [2]
+
+    with open("data/hard-9x9.txt") as f:
+        cnf = CNFClauseSet.from_sudoku(f.readline().strip())
+    for engine in engines:
+        dpll = DPLLDLIS(cnf, engine=engine, budget=Budget(branches=10))
+        assert first_decisions(dpll, 5) == [113, 134, 244, 342, 371]
+
+
+def first_decisions(dpll, count):
+    decisions = []
+    choose_literal = dpll.choose_literal
+
+    def record(cnf, model):
+        decisions.append(choose_literal(cnf, model))
+        return decisions[-1]
+
+    dpll.choose_literal = record
+    dpll.solve()
+    return decisions[:count]
+
+
+def test_backtrack_jw():
+    formula = [[1, 2, 3, 4, 5], [1], [-2], [3], [4, -5]]
+    for engine in ["trail", "bitset", "copy"]:
+        for dynamic in [False, True]:
+            if engine == "bitset" and dynamic:
+                continue
+            dpll = DPLLDLJW(CNFClauseSet(formula), engine=engine, dynamic=dynamic)
+            result = dpll.solve()
+            assert result[0] == True
+            assert len(result[1]) == 5
+
+
+def test_backtrack_trail_deep():
+    # every decision only fixes its own pair, so the search is 2000 levels
+    # deep, beyond the default recursion limit
+    formula = []
+    for i in range(1, 4001, 2):
+        formula += [[i, i + 1], [-i, -(i + 1)]]
+    dpll = DPLLRandom(CNFClauseSet(formula))
+    result = dpll.solve()
+    assert result[0] == True
+    assert all(result[1][i] != result[1][i + 1] for i in range(1, 4001, 2))
+
+
+def test_portfolio():
+    cnf = CNFClauseSet([[1, 2, 3, 4, 5], [1], [-2], [3], [4, -5]])
+    solver = Portfolio(cnf, [("cdcl", 0), ("random", 1)])
+    result = solver.solve()
+    assert result[0] == True
+    assert result[1][1] and not result[1][2] and result[1][3]
+    assert solver.winner in [("cdcl", 0), ("random", 1)]
+
+    cnf = CNFClauseSet([[1], [-1]])
+    assert Portfolio(cnf, [("dlis", 0), ("jsw", 0)]).solve()[0] == False
+
+
+def test_portfolio_crash():
+    assert SOLVERS["crash"] is CrashingSolver
+    cnf = CNFClauseSet([[1, 2], [-1]])
+    result = Portfolio(cnf, [("crash", 0), ("cdcl", 0)]).solve()
+    assert result[0] and result[1][2]
+    try:
+        Portfolio(cnf, [("crash", 0)]).solve()
+        assert False
+    except RuntimeError as e:
+        assert "exited with code 1" in str(e)
+
+
+def test_batch_propagate():
+    propagator = BatchPropagator(CNFClauseSet([[1, 2], [-2, 3], [-3, -1], [4, 5]]))
+    values = propagator.assignments([[1], [-1], [2, 1]])
+    status = propagator.propagate(values)
+    assert propagator.model(values[0]) == {1: True, 2: False, 3: False}
+    assert propagator.model(values[1]) == {1: False, 2: True, 3: True}
+    assert status[2] == UNSAT
+
+    values = propagator.assignments([[1, 4]])
+    assert propagator.propagate(values)[0] == SAT
+
+
+def test_solve_sudokus():
+    with open("data/easy-9x9.txt") as f:
+        sudokus = [line.strip() for line in f.readlines()[:10]]
+    with open("data/hard-9x9.txt") as f:
+        sudokus += [f.readline().strip()]
+    results = solve_sudokus(sudokus)
+    for sudoku, (sat, model) in zip(sudokus, results):
+        expected = DPLLRandom(CNFClauseSet.from_sudoku(sudoku)).solve()[1]
+        assert sat
+        assert {k for k in model if model[k]} == {k for k in expected if expected[k]}
+
+
+def test_benchmark_dataset():
+    records = benchmark_dataset(
+        "data/easy-4x4.txt", ["random", "cdcl"], repeat=2, warmup=0, limit=3
+    )
+    assert len(records) == 3 * 2 * 2
+    assert all(record["sat"] for record in records)
+    for record in records:
+        phases = record["unit_propagation_ns"] + record["choose_literal_ns"]
+        assert 0 < phases <= record["solve_ns"]
+    summary = summarize(records)
+    assert summary["easy-4x4.txt/random"]["runs"] == 6
+
+    baseline = {key: dict(stats) for key, stats in summary.items()}
+    baseline["easy-4x4.txt/cdcl"]["median_ns"] /= 2
+    assert list(regressions(summary, baseline)) == ["easy-4x4.txt/cdcl"]
+
+    # a timed out solve is recorded once and the solver moves on
+    records = benchmark_dataset(
+        "data/hard-9x9.txt", ["jsw", "cdcl"], repeat=3, warmup=0, limit=2, timeout=0
+    )
+    assert len(records) == 2 * 2
+    assert all(record["status"] == "TIMEOUT" for record in records)
+    timed_out = summarize(records)
+    assert timed_out["hard-9x9.txt/jsw"]["timeouts"] == 2
+    assert timed_out["hard-9x9.txt/jsw"]["median_ns"] is None
+
+
+def test_budget():
+    with open("data/hard-9x9.txt") as f:
+        cnf = CNFClauseSet.from_sudoku(f.readline().strip())
+    for engine in ["trail", "copy"]:
+        dpll = DPLLDLJW(cnf, engine=engine, budget=Budget(branches=3))
+        assert dpll.solve() == (UNKNOWN, None)
+        assert dpll.branch_count == 3
+        assert dpll.budget.exceeded == "branches"
+
+    dpll = DPLLRandom(cnf, budget=Budget(time=0))
+    assert dpll.solve() == (UNKNOWN, None)
+    assert dpll.budget.exceeded == "time"
+
+    budget = Budget(time=60, branches=10**6, memory=1 << 40)
+    assert DPLLDLJW(cnf, budget=budget).solve()[0] is True
+    assert budget.exceeded is None
+
+    # the memory limit is on the growth during a solve, not on the process
+    dpll = DPLLDLJW(cnf, budget=Budget(memory=16 << 20))
+    # every decision holds on to another megabyte
+    held = []
+    dpll.stats.add_hook("decisions", lambda solver: held.append(b"x" * (1 << 20)))
+    assert dpll.solve() == (UNKNOWN, None)
+    assert dpll.budget.exceeded == "memory"
+    budget = Budget(memory=memory_usage() // 2)
+    for _ in range(2):
+        assert DPLLDLJW(cnf, budget=budget).solve()[0] is True
+
+
+def test_statistics():
+    with open("data/hard-9x9.txt") as f:
+        cnf = CNFClauseSet.from_sudoku(f.readline().strip())
+    counts = []
+    for engine in ["trail", "bitset"]:
+        dpll = DPLLDLJW(cnf, engine=engine)
+        dpll.stats.timing = True
+        sampled = []
+        dpll.stats.add_hook("conflicts", lambda solver: sampled.append(solver))
+        assert dpll.solve()[0]
+        stats = dpll.stats.as_dict()
+        # every failed decision is undone once
+        assert stats["backtracks"] == dpll.branch_count - 1
+        assert len(sampled) == stats["conflicts"] > 0
+        assert sampled[0] is dpll
+        assert stats["unit_propagation_time"] > 0
+        counts.append(dpll.stats.counts)
+    assert counts[0] == counts[1]
+
+
 def main():
     tests = [
         test_remove_unit_clauses,
@@ -89,6 +399,23 @@ def main():
         test_backtrack1,
         test_backtrack2,
         test_backtrack_invalid,
+        test_trail_backtrack_restores,
+        test_trail_pure_literals,
+        test_backtrack_trail1,
+        test_backtrack_trail_invalid,
+        test_backtrack_bitset,
+        test_jw_scores_incremental,
+        test_dlis_counts_incremental,
+        test_dlis_ties,
+        test_backtrack_jw,
+        test_backtrack_trail_deep,
+        test_portfolio,
+        test_portfolio_crash,
+        test_batch_propagate,
+        test_solve_sudokus,
+        test_benchmark_dataset,
+        test_budget,
+        test_statistics,
     ]
     for test in tests:
         test()